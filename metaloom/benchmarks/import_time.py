@@ -0,0 +1,55 @@
+"""
+Measures how long it takes to import metaloom modules in a fresh interpreter.
+
+Usage:
+    python benchmarks/import_time.py                      # metaloom.base.main, 10 runs
+    python benchmarks/import_time.py metaloom.base.calls --runs 20 --budget-ms 80
+
+Exits with status 1 when the median import time is over `--budget-ms`.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def import_time_ms(module: str) -> float:
+    """
+    Import `module` in a new interpreter and return the cumulative time `-X importtime` reports for it.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        cwd=ROOT,
+        env={**os.environ, "PYTHONPATH": os.pathsep.join(filter(None, [ROOT, os.environ.get("PYTHONPATH")]))},
+        check=True,
+    )
+    for line in reversed(result.stderr.splitlines()):
+        parts = [part.strip() for part in line.split("|")]
+        if len(parts) == 3 and parts[2] == module:
+            return int(parts[1]) / 1000
+    raise RuntimeError(f"No import time reported for {module}")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("modules", nargs="*", default=["metaloom.base.main"])
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--budget-ms", type=float, default=100.0)
+    args = parser.parse_args()
+
+    over_budget = False
+    for module in args.modules:
+        samples = [import_time_ms(module) for _ in range(args.runs)]
+        median = statistics.median(samples)
+        over_budget |= median > args.budget_ms
+        print(f"{module:32} median {median:8.1f} ms   min {min(samples):8.1f} ms   budget {args.budget_ms:.0f} ms")
+    return 1 if over_budget else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,64 @@
+"""
+Measures building MultiTemplate prompts with and without the compiled message cache.
+
+Usage:
+    python benchmarks/prompt_cache.py                          # 500 selection options, 200 builds
+    python benchmarks/prompt_cache.py --options 5000 --builds 50
+
+Each build selects a template with large selection and meta request sets, then renders it
+with `render`, as `MultiTemplate.cue` does before the model call.
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from metaloom.base.multiprompt import MultiTemplate  # noqa: E402
+
+
+def template(options: int) -> MultiTemplate:
+    multi = MultiTemplate()
+    multi.add_template(
+        name="classify",
+        system="You classify support tickets.",
+        template="Classify this ticket: {ticket}",
+        input_variables=["ticket"],
+        output_variables={"label": "The chosen category", "reason": "Why it was chosen"},
+        meta_requests={"meta": {f"field_{i}": f"Meta field {i}" for i in range(options // 10)}},
+        selections={"category": {f"category_{i}": f"Description of category {i}" for i in range(options)}},
+        rules=["Pick exactly one category", "Answer in JSON"],
+    )
+    return multi
+
+
+def time_builds(multi: MultiTemplate, builds: int, cached: bool) -> list:
+    samples = []
+    for _ in range(builds):
+        if not cached:
+            multi.invalidate()
+        started = time.perf_counter()
+        multi.select("classify")
+        multi.render("classify", {"ticket": "My invoice is wrong"})
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--options", type=int, default=500)
+    parser.add_argument("--builds", type=int, default=200)
+    args = parser.parse_args()
+
+    multi = template(args.options)
+    for label, cached in (("uncached", False), ("cached", True)):
+        samples = time_builds(multi, args.builds, cached)
+        print(f"{label:10} median {statistics.median(samples) * 1000:8.3f} ms   max {max(samples) * 1000:8.3f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
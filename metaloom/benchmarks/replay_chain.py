@@ -0,0 +1,104 @@
+"""
+Replays recorded model calls through a chain to measure orchestration throughput offline.
+
+Usage:
+    python benchmarks/replay_chain.py calls.jsonl --record          # record the demo chain against the fake backend
+    python benchmarks/replay_chain.py calls.jsonl --runs 50 --concurrency 8
+    python benchmarks/replay_chain.py calls.jsonl --scale 0         # orchestration overhead only
+    python benchmarks/replay_chain.py calls.jsonl --factory mypkg.bench:build
+
+A factory takes an LLM and returns `(chain, chain_name, kwargs)`. Record with the same
+factory against a real backend by passing `--record --backend vertexai`.
+"""
+import argparse
+import importlib
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from metaloom.base.backends import load_llm  # noqa: E402
+from metaloom.base.calls import LLMCaller  # noqa: E402
+from metaloom.base.main import RunnableChain  # noqa: E402
+from metaloom.base.recording import Recorder  # noqa: E402
+
+
+def outline(topic: str, sections: int = 3):
+    """Outline an article."""
+    return {"outline": f"{sections} sections about {topic}"}
+
+
+def draft(outline: str):
+    """Draft an article from an outline."""
+    return {"draft": outline.upper()}
+
+
+def summary(draft: str):
+    """Summarize a draft."""
+    return {"summary": draft[:40]}
+
+
+def demo(llm) -> Tuple[RunnableChain, str, Dict[str, Any]]:
+    chain = RunnableChain(llm, caller=LLMCaller())
+    chain.add_function("outline", outline, "Outline an article about {topic}")
+    chain.add_function("draft", draft, "Draft an article from this outline: {outline}")
+    chain.add_function("summary", summary, "Summarize this draft: {draft}")
+    chain.define_sequence_chain("article", ["outline", "draft", "summary"])
+    if hasattr(llm, "register_chain"):
+        llm.register_chain(chain)
+    return chain, "article", {"topic": "replay benchmarks"}
+
+
+def load_factory(spec: str) -> Callable[[Any], Tuple[RunnableChain, str, Dict[str, Any]]]:
+    module, _, name = spec.partition(":")
+    return getattr(importlib.import_module(module), name)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("recording")
+    parser.add_argument("--record", action="store_true", help="record instead of replaying")
+    parser.add_argument("--backend", default="fake", help="backend to record against")
+    parser.add_argument("--factory", default=None, help="module:function building the chain")
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--scale", type=float, default=1.0, help="multiplier for recorded latency")
+    args = parser.parse_args()
+    factory = load_factory(args.factory) if args.factory else demo
+
+    if args.record:
+        config = {"latency": 0.05, "jitter": 0.05} if args.backend == "fake" else {}
+        chain, chain_name, kwargs = factory(load_llm(args.backend, **config))
+        chain.caller.recorder = Recorder(args.recording)
+        chain.call_chain(chain_name, **kwargs)
+        print(f"recorded {chain.caller.recorder.count} calls to {args.recording}")
+        return 0
+
+    llm = load_llm("replay", path=args.recording, scale=args.scale)
+    chain, chain_name, kwargs = factory(llm)
+
+    def run(_: int) -> float:
+        started = time.perf_counter()
+        chain.call_chain(chain_name, **dict(kwargs))
+        return time.perf_counter() - started
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        samples = sorted(pool.map(run, range(args.runs)))
+    elapsed = time.perf_counter() - started
+    p95 = samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+    print(
+        f"{args.runs} runs in {elapsed:.2f} s   {args.runs / elapsed:8.2f} chains/s   "
+        f"median {statistics.median(samples) * 1000:8.1f} ms   p95 {p95 * 1000:8.1f} ms   "
+        f"replayed {llm.stats['hits']} calls, {llm.stats['misses']} missing"
+    )
+    return 1 if llm.stats["misses"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
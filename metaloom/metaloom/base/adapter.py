@@ -0,0 +1,123 @@
+import inspect
+import re
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from metaloom.base.decoding import CoercionError, coerce
+
+
+def _normalize(name: str) -> str:
+    return re.sub(r"[^0-9a-z]", "", str(name).lower())
+
+
+class SchemaAdapter:
+    """
+    Maps one step's output onto the next step's inputs without a model call when it can.
+
+    A target input is matched to an output key by exact name, then by a configured alias,
+    then by a normalized name (case, `_` and `-` ignored). Values are coerced to the
+    annotations of the consuming function. If any input is left unmatched, or a value
+    cannot be coerced, `adapt` returns None and the chain falls back to `transform_params`.
+
+    Mappings are cached per (producer, consumer) pair. Mappings that an LLM transform
+    produced by copying values through unchanged are learned as well.
+
+    Attributes:
+        aliases: Target input name -> list of accepted source names.
+        mappings: (producer, consumer) -> {target input: source key}.
+        stats: Counts of `direct` mappings and `fallback` transforms.
+    """
+
+    def __init__(self, aliases: Optional[Dict[str, List[str]]] = None) -> None:
+        self.aliases: Dict[str, List[str]] = {k: list(v) for k, v in (aliases or {}).items()}
+        self.mappings: Dict[Tuple[str, str], Dict[str, str]] = {}
+        self.stats = {"direct": 0, "fallback": 0}
+        self._lock = threading.Lock()
+
+    def add_alias(self, name: str, *aliases: str) -> None:
+        self.aliases.setdefault(name, []).extend(aliases)
+
+    def match(self, data: Dict[str, Any], inputs: List[str]) -> Optional[Dict[str, str]]:
+        """
+        Find a source key in `data` for every name in `inputs`.
+
+        Returns:
+            {target input: source key}, or None if any input has no source.
+        """
+        normalized = {_normalize(key): key for key in data}
+        mapping = {}
+        for target in inputs:
+            candidates = [target, *self.aliases.get(target, [])]
+            source = next((c for c in candidates if c in data), None)
+            if source is None:
+                source = next((normalized[_normalize(c)] for c in candidates if _normalize(c) in normalized), None)
+            if source is None:
+                return None
+            mapping[target] = source
+        return mapping
+
+    def adapt(
+        self,
+        producer: str,
+        consumer: str,
+        data: Any,
+        inputs: List[str],
+        signature: Optional[inspect.Signature] = None,
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Map `data` produced by `producer` onto the `inputs` of `consumer`.
+
+        Args:
+            producer: Name of the step that produced `data`.
+            consumer: Name of the step that will receive the inputs.
+            data: The producer's output.
+            inputs: The input variables of the consumer.
+            signature: The consumer function's signature, used for type coercion.
+
+        Returns:
+            The consumer inputs, or None if the LLM transform is needed.
+        """
+        mapping = None
+        if isinstance(data, dict):
+            with self._lock:
+                mapping = self.mappings.get((producer, consumer))
+            if mapping is None or set(mapping) != set(inputs) or not set(mapping.values()) <= set(data):
+                mapping = self.match(data, inputs)
+        inputs_out = None
+        if mapping is not None:
+            params = signature.parameters if signature is not None else {}
+            try:
+                inputs_out = {
+                    target: coerce(data[source], params[target].annotation) if target in params else data[source]
+                    for target, source in mapping.items()
+                }
+            except CoercionError:
+                inputs_out = None
+        with self._lock:
+            if inputs_out is None:
+                self.stats["fallback"] += 1
+                return None
+            self.mappings[(producer, consumer)] = mapping
+            self.stats["direct"] += 1
+        return inputs_out
+
+    def learn(self, producer: str, consumer: str, data: Any, transformed: Any) -> None:
+        """
+        Remember the mapping of an LLM transform that only copied values across.
+
+        Args:
+            producer: Name of the step that produced `data`.
+            consumer: Name of the step the transform was made for.
+            data: The transform input.
+            transformed: The transform output.
+        """
+        if not isinstance(data, dict) or not isinstance(transformed, dict) or not transformed:
+            return
+        mapping = {}
+        for target, value in transformed.items():
+            sources = [key for key, source_value in data.items() if source_value == value]
+            if len(sources) != 1:
+                return
+            mapping[target] = sources[0]
+        with self._lock:
+            self.mappings[(producer, consumer)] = mapping
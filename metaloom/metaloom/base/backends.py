@@ -0,0 +1,357 @@
+import ast
+import inspect
+import json
+import os
+import random
+import re
+import string
+import threading
+import time
+from functools import lru_cache
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, Type
+
+from langchain_core.runnables import Runnable
+
+from metaloom.base.calls import prompt_text
+from metaloom.base.recording import load_recording, prompt_key
+
+_BACKENDS: Dict[str, Callable[..., Any]] = {}
+_CLIENTS: Dict[str, Any] = {}
+_CLIENT_LOCKS: Dict[str, threading.Lock] = {}
+_CLIENTS_LOCK = threading.Lock()
+
+DEFAULT_BACKEND = "vertexai"
+
+
+def register_backend(name: str, factory: Callable[..., Any]) -> None:
+    """
+    Make a model backend available to `load_llm` under `name`.
+
+    Args:
+        name: The backend name.
+        factory: Called with the model config, returns the LLM object.
+    """
+    _BACKENDS[name] = factory
+
+
+def available_backends() -> List[str]:
+    return sorted(_BACKENDS)
+
+
+def load_llm(backend: Optional[str] = None, **config: Any) -> Any:
+    """
+    Build a model from a registered backend.
+
+    Args:
+        backend: The backend name; defaults to the `METALOOM_BACKEND` environment variable, then "vertexai".
+        config: Passed to the backend factory.
+
+    Returns:
+        The LLM object.
+    """
+    name = backend or os.environ.get("METALOOM_BACKEND", DEFAULT_BACKEND)
+    if name not in _BACKENDS:
+        raise KeyError(f"Backend '{name}' does not exist, choose one of {available_backends()}")
+    return _BACKENDS[name](**config)
+
+
+def client_key(backend: Optional[str] = None, **config: Any) -> str:
+    name = backend or os.environ.get("METALOOM_BACKEND", DEFAULT_BACKEND)
+    return json.dumps([name, config], sort_keys=True, default=str)
+
+
+def get_client(backend: Optional[str] = None, **config: Any) -> Any:
+    """
+    The shared model client for a backend and config, built by `load_llm` on first use.
+
+    Clients are shared across threads and callers, so each config pays client setup once
+    and later calls reuse the client's open connections.
+
+    Args:
+        backend: The backend name, as for `load_llm`.
+        config: Passed to the backend factory; together with the backend, the pool key.
+
+    Returns:
+        The LLM object.
+    """
+    key = client_key(backend, **config)
+    client = _CLIENTS.get(key)
+    if client is not None:
+        return client
+    with _CLIENTS_LOCK:
+        lock = _CLIENT_LOCKS.setdefault(key, threading.Lock())
+    with lock:
+        if key not in _CLIENTS:
+            _CLIENTS[key] = load_llm(backend, **config)
+        return _CLIENTS[key]
+
+
+def clear_clients() -> None:
+    """
+    Drop the pooled clients, e.g. after credentials change.
+
+    The per-key build locks are kept: a thread may be building a client under one, and a
+    new lock for the same key would let a second build run alongside it.
+    """
+    with _CLIENTS_LOCK:
+        _CLIENTS.clear()
+
+
+@lru_cache(maxsize=None)
+def _load_env() -> None:
+    from dotenv import load_dotenv
+
+    load_dotenv()
+
+
+def vertexai(
+    model_name       : str   = "gemini-pro",
+    max_output_tokens: int   = 8000,
+    temperature      : float = 0.5,
+    project          : str   = "okguis",
+    streaming        : bool  = False,
+    **kwargs         : Any,
+    ):
+    from langchain_google_vertexai import VertexAI
+
+    _load_env()
+    return VertexAI(
+        model_name        = model_name,
+        max_output_tokens = max_output_tokens,
+        temperature       = temperature,
+        project           = project,
+        streaming         = streaming,
+        **kwargs,
+    )
+
+
+def _template_pattern(template: str) -> "re.Pattern[str]":
+    parts = []
+    seen = set()
+    for literal, field, _, _ in string.Formatter().parse(template):
+        parts.append(re.escape(literal))
+        if field is None:
+            continue
+        if field.isidentifier() and field not in seen:
+            parts.append(f"(?P<{field}>.*?)")
+            seen.add(field)
+        else:
+            parts.append(f"(?P={field})" if field in seen else ".*?")
+    return re.compile("".join(parts), re.S)
+
+
+def _placeholder(param: inspect.Parameter) -> Any:
+    if param.default is not inspect.Parameter.empty:
+        return param.default
+    return {int: 0, float: 0.0, bool: False, list: [], dict: {}}.get(param.annotation, param.name)
+
+
+class FakeLLM(Runnable):
+    """
+    A deterministic offline model for tests and load tests.
+
+    It answers with JSON that fits the signature of the function whose input template
+    the prompt was rendered from. Parameters named like a template variable echo the
+    value from the prompt; other parameters get their default, or a placeholder for their
+    annotated type. Transform prompts from `RunnableChain.transform_params` and
+    `transform_many` are answered by copying the requested keys out of the input data. Unrecognized prompts get `{}`.
+
+    Attributes:
+        latency: Seconds each call takes.
+        jitter: Extra random seconds added to each call, up to this value.
+        error_rate: Probability (0-1) that a call raises `error`.
+        error: The exception type raised by injected errors.
+        chunk_size: Characters per chunk when streaming.
+        calls: Number of calls made.
+
+    Examples:
+        FAKE  = FakeLLM(latency=0.2, error_rate=0.05, seed=1)
+        CHAIN = RunnableChain(FAKE)
+        CHAIN.add_function("write", write, "Write about {topic}")
+        FAKE.register_chain(CHAIN)
+    """
+
+    def __init__(
+        self,
+        latency   : float = 0.0,
+        jitter    : float = 0.0,
+        error_rate: float = 0.0,
+        error     : Type[Exception] = ConnectionError,
+        seed      : int   = 0,
+        chunk_size: int   = 16,
+        model_name: str   = "fake",
+        **params  : Any,
+    ) -> None:
+        super().__init__()
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error = error
+        self.chunk_size = chunk_size
+        self.model_name = model_name
+        self.params = params
+        self.calls = 0
+        self.templates: List[Tuple["re.Pattern[str]", inspect.Signature]] = []
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    @property
+    def _identifying_params(self) -> Dict[str, Any]:
+        return {"model_name": self.model_name, **self.params}
+
+    def register(self, template: str, function: Callable) -> "FakeLLM":
+        """
+        Answer prompts rendered from `template` with JSON for `function`'s signature.
+        """
+        self.templates.append((_template_pattern(template), inspect.signature(function)))
+        self.templates.sort(key=lambda entry: len(entry[0].pattern), reverse=True)
+        return self
+
+    def register_chain(self, chain) -> "FakeLLM":
+        """
+        Register every function of a `RunnableChain`.
+        """
+        for name, entry in chain.function_mapping.items():
+            if name != "transform":
+                self.register(entry["input_template"], entry["function"])
+        return self
+
+    def respond(self, text: str) -> str:
+        """
+        The JSON answer for a rendered prompt.
+        """
+        targets = re.search(r"target keys: (\{.*\})", text)
+        if targets:
+            data = re.search(r"input data: (\{.*\})", text, re.S)
+            try:
+                source = ast.literal_eval(data.group(1)) if data else {}
+            except (ValueError, SyntaxError):
+                source = {}
+            return json.dumps({
+                name: {key: source.get(key, key) for key in keys}
+                for name, keys in ast.literal_eval(targets.group(1)).items()
+            }, default=str)
+        keys = re.search(r"output keys: (\[.*?\])", text)
+        if keys:
+            data = re.search(r"input data: (\{.*\})", text, re.S)
+            try:
+                source = ast.literal_eval(data.group(1)) if data else {}
+            except (ValueError, SyntaxError):
+                source = {}
+            return json.dumps({key: source.get(key, key) for key in ast.literal_eval(keys.group(1))}, default=str)
+        for pattern, signature in self.templates:
+            match = pattern.fullmatch(text)
+            if match:
+                captured = match.groupdict()
+                return json.dumps({
+                    name: captured[name] if name in captured else _placeholder(param)
+                    for name, param in signature.parameters.items()
+                }, default=str)
+        return "{}"
+
+    def _call(self) -> None:
+        with self._lock:
+            self.calls += 1
+            delay = self.latency + self._random.uniform(0, self.jitter)
+            fail = self._random.random() < self.error_rate
+        time.sleep(delay)
+        if fail:
+            raise self.error("Injected fake backend error")
+
+    def invoke(self, input: Any, config: Optional[Dict[str, Any]] = None, **kwargs: Any) -> str:
+        self._call()
+        return self.respond(prompt_text(input))
+
+    def stream(self, input: Any, config: Optional[Dict[str, Any]] = None, **kwargs: Any) -> Iterator[str]:
+        text = self.respond(prompt_text(input))
+        self._call()
+        for i in range(0, len(text), self.chunk_size):
+            yield text[i:i + self.chunk_size]
+
+    def get_num_tokens(self, text: str) -> int:
+        return (len(text) + 3) // 4
+
+
+class ReplayLLM(Runnable):
+    """
+    Serves the responses saved by a `Recorder`, for reproducible offline benchmarks and
+    regression tests of the orchestration layer.
+
+    Prompts are matched on their rendered text. A prompt recorded several times gets its
+    responses back in recorded order, starting over after the last one.
+
+    Attributes:
+        scale: Multiplier for the recorded latency of each response (0 for no delay).
+        latency: Fixed seconds per call instead of the recorded latency, or None.
+        strict: Raise `KeyError` for prompts missing from the recording; otherwise answer `{}`.
+        chunk_size: Characters per chunk when streaming.
+        stats: Counts of prompts found ("hits") and missing ("misses").
+
+    Examples:
+        REPLAY = load_llm("replay", path="calls.jsonl", scale=0.5)
+        CHAIN  = RunnableChain(REPLAY)
+    """
+
+    def __init__(
+        self,
+        path      : str,
+        scale     : float           = 1.0,
+        latency   : Optional[float] = None,
+        strict    : bool            = True,
+        chunk_size: int             = 16,
+        model_name: str             = "replay",
+        **params  : Any,
+    ) -> None:
+        super().__init__()
+        self.path = path
+        self.scale = scale
+        self.latency = latency
+        self.strict = strict
+        self.chunk_size = chunk_size
+        self.model_name = model_name
+        self.params = params
+        self.entries = load_recording(path)
+        self.stats = {"hits": 0, "misses": 0}
+        self._cursors: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def _identifying_params(self) -> Dict[str, Any]:
+        return {"model_name": self.model_name, "path": str(self.path), **self.params}
+
+    def respond(self, prompt: Any) -> str:
+        """
+        The recorded answer for a prompt, after waiting out its latency.
+        """
+        key = prompt_key(prompt)
+        with self._lock:
+            entries = self.entries.get(key)
+            if not entries:
+                self.stats["misses"] += 1
+            else:
+                self.stats["hits"] += 1
+                cursor = self._cursors.get(key, 0)
+                self._cursors[key] = (cursor + 1) % len(entries)
+        if not entries:
+            if self.strict:
+                raise KeyError(f"No recorded response for prompt: {prompt_text(prompt)[:200]!r}")
+            return "{}"
+        entry = entries[cursor]
+        time.sleep(self.latency if self.latency is not None else entry["latency"] * self.scale)
+        return entry["response"]
+
+    def invoke(self, input: Any, config: Optional[Dict[str, Any]] = None, **kwargs: Any) -> str:
+        return self.respond(input)
+
+    def stream(self, input: Any, config: Optional[Dict[str, Any]] = None, **kwargs: Any) -> Iterator[str]:
+        text = self.respond(input)
+        for i in range(0, len(text), self.chunk_size):
+            yield text[i:i + self.chunk_size]
+
+    def get_num_tokens(self, text: str) -> int:
+        return (len(text) + 3) // 4
+
+
+register_backend("vertexai", vertexai)
+register_backend("fake", FakeLLM)
+register_backend("replay", ReplayLLM)
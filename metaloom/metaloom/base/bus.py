@@ -0,0 +1,174 @@
+import hashlib
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional
+
+MODES = ("full", "outputs", "last", "spill")
+
+HANDLE_KEY = "$handle"
+
+
+def is_handle(value: Any) -> bool:
+    return isinstance(value, dict) and len(value) == 1 and HANDLE_KEY in value
+
+
+class ValueStore:
+    """
+    Stores large step values on disk in an SQLite database, once per distinct value,
+    and hands out `{"$handle": <sha256>}` references to them. Without a `db_path` the
+    database is a temporary file, removed by `close`.
+
+    Examples:
+        STORE  = ValueStore("values.db")
+        HANDLE = STORE.put(document)
+        STORE.get(HANDLE) == document
+    """
+
+    def __init__(self, db_path: Optional[str] = None):
+        self._owned = db_path is None
+        if db_path is None:
+            fd, db_path = tempfile.mkstemp(prefix="metaloom-bus-", suffix=".db")
+            os.close(fd)
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        with self.conn:
+            self.conn.execute(
+                """CREATE TABLE IF NOT EXISTS bus_values (
+                handle TEXT PRIMARY KEY,
+                value TEXT NOT NULL
+            )"""
+            )
+
+    def put(self, value: Any, text: Optional[str] = None) -> Dict[str, str]:
+        """
+        Store a value, unless an identical one is already stored.
+
+        Args:
+            value: A JSON-serializable value.
+            text: The value already serialized, if the caller has it.
+
+        Returns:
+            The handle of the value.
+        """
+        text = text if text is not None else json.dumps(value, default=str, sort_keys=True)
+        handle = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        with self._lock, self.conn:
+            self.conn.execute("INSERT OR IGNORE INTO bus_values (handle, value) VALUES (?, ?)", (handle, text))
+        return {HANDLE_KEY: handle}
+
+    def get(self, value: Any) -> Any:
+        """
+        Load the value behind a handle; other values are returned as they are.
+        """
+        if not is_handle(value):
+            return value
+        with self._lock:
+            row = self.conn.execute("SELECT value FROM bus_values WHERE handle = ?", (value[HANDLE_KEY],)).fetchone()
+        if row is None:
+            raise KeyError(f"Handle '{value[HANDLE_KEY]}' does not exist")
+        return json.loads(row[0])
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self.conn.execute("SELECT COUNT(*) FROM bus_values").fetchone()[0]
+
+    def close(self):
+        """
+        Closes the database connection, and removes the database if it is a temporary file.
+
+        Returns:
+            None
+        """
+        with self._lock:
+            self.conn.close()
+            if self._owned and os.path.exists(self.db_path):
+                os.remove(self.db_path)
+            self._owned = False
+
+    def __del__(self):
+        """
+        Closes the store when the object is destroyed.
+
+        Returns:
+            None
+        """
+        if hasattr(self, "conn"):
+            self.close()
+
+
+class Retention:
+    """
+    How much of each step record the bus returned by `call_chain` keeps.
+
+    Attributes:
+        mode: "full" keeps every record as is; "outputs" drops step inputs; "last" keeps
+            only the last `last` records; "spill" keeps every record, but moves inputs and
+            outputs over `threshold` characters of JSON to `store` and keeps their handle.
+        last: Records kept in "last" mode.
+        store: The `ValueStore` for "spill" mode; a temporary one by default.
+        threshold: Size in characters from which "spill" mode moves a value to the store.
+
+    Examples:
+        CHAIN = RunnableChain(llm, retention=Retention("spill", threshold=10_000))
+        BUS   = CHAIN.call_chain("summarize_book", book=text)
+        CHAIN.retention.store.get(BUS[-1][9]["output"])
+    """
+
+    def __init__(
+        self,
+        mode     : str                  = "full",
+        last     : Optional[int]        = None,
+        store    : Optional[ValueStore] = None,
+        threshold: int                  = 4096,
+    ) -> None:
+        if mode not in MODES:
+            raise ValueError(f"Retention mode '{mode}' does not exist, choose one of {list(MODES)}")
+        if mode == "last" and not last:
+            raise ValueError("Retention mode 'last' needs the number of records to keep")
+        self.mode = mode
+        self.last = last
+        self.threshold = threshold
+        self.store = store if store is not None or mode != "spill" else ValueStore()
+
+    def spill(self, value: Any) -> Any:
+        if is_handle(value):
+            return value
+        text = json.dumps(value, default=str, sort_keys=True)
+        if len(text) < self.threshold:
+            return value
+        return self.store.put(value, text)
+
+
+class Bus:
+    """
+    Collects the step records of one chain run under a `Retention`.
+    """
+
+    def __init__(self, retention: Optional[Retention] = None) -> None:
+        self.retention = retention or Retention()
+        maxlen = self.retention.last if self.retention.mode == "last" else None
+        self.records: Deque[Dict[int, Dict[str, Any]]] = deque(maxlen=maxlen)
+
+    def append(self, step_info: Dict[int, Dict[str, Any]]) -> None:
+        mode = self.retention.mode
+        if mode in ("outputs", "spill"):
+            step_info = {i: dict(record) for i, record in step_info.items()}
+            for record in step_info.values():
+                if mode == "outputs":
+                    record.pop("inputs", None)
+                else:
+                    for field in ("inputs", "output"):
+                        if field in record:
+                            record[field] = self.retention.spill(record[field])
+        self.records.append(step_info)
+
+    def steps(self) -> List[Dict[int, Dict[str, Any]]]:
+        """
+        The kept records, ordered by step index.
+        """
+        return sorted(self.records, key=lambda step_info: next(iter(step_info)))
@@ -0,0 +1,151 @@
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional
+
+
+class ResponseCache:
+    """
+    A content-addressed store for raw LLM responses, backed by an SQLite database.
+
+    Entries are keyed by a hash of the rendered prompt, the model name and the generation
+    parameters (see `metaloom.base.calls.request_key`), so identical calls made by chain
+    steps are answered from disk instead of the network.
+
+    Entries older than `ttl` seconds are treated as misses and removed. When more than
+    `max_entries` responses are stored, the least recently used ones are evicted.
+
+    Hit and miss counts are kept per step name in `stats`.
+
+    Examples:
+        CACHE = ResponseCache("responses.db", ttl=24 * 3600, max_entries=5000)
+        CHAIN = RunnableChain(llm, caller=LLMCaller(cache=CACHE))
+        CHAIN.call_chain("my_chain", topic="cats")
+        print(CACHE.stats)
+        # {'transform:write': {'hits': 1, 'misses': 0}, 'write': {'hits': 1, 'misses': 0}}
+    """
+
+    def __init__(self, db_path, ttl: Optional[float] = None, max_entries: Optional[int] = 1000):
+        self.db_path = db_path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.stats: Dict[str, Dict[str, int]] = {}
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._create_tables()
+
+    def _create_tables(self):
+        """
+        Creates the response table if needed.
+
+        Returns:
+            None
+        """
+        with self.conn:
+            self.conn.execute(
+                """CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                step TEXT,
+                response TEXT NOT NULL,
+                created REAL NOT NULL,
+                accessed REAL NOT NULL
+            )"""
+            )
+            self.conn.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)")
+
+    def _record(self, step: str, outcome: str):
+        counts = self.stats.setdefault(step, {"hits": 0, "misses": 0})
+        counts[outcome] += 1
+
+    def get(self, key: str, step: str = "") -> Optional[str]:
+        """
+        Looks up a cached response.
+
+        Args:
+            key (str): The request key.
+            step (str): The chain step making the call, used for hit/miss stats.
+
+        Returns:
+            str: The cached response, or None on a miss or an expired entry.
+        """
+        now = time.time()
+        with self._lock, self.conn:
+            row = self.conn.execute("SELECT response, created FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is not None and self.ttl is not None and now - row[1] > self.ttl:
+                self.conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                row = None
+            if row is None:
+                self._record(step, "misses")
+                return None
+            self.conn.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+            self._record(step, "hits")
+            return row[0]
+
+    def set(self, key: str, response: str, step: str = ""):
+        """
+        Stores a response, evicting the least recently used entries above `max_entries`.
+
+        Args:
+            key (str): The request key.
+            response (str): The raw response text.
+            step (str): The chain step that made the call.
+
+        Returns:
+            None
+        """
+        now = time.time()
+        with self._lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO responses (key, step, response, created, accessed) VALUES (?, ?, ?, ?, ?)",
+                (key, step, response, now, now),
+            )
+            self._evict()
+
+    def delete(self, key: str):
+        """
+        Removes a cached response, if there is one.
+
+        Args:
+            key (str): The request key.
+
+        Returns:
+            None
+        """
+        with self._lock, self.conn:
+            self.conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+
+    def _evict(self):
+        if self.max_entries is None:
+            return
+        cursor = self.conn.execute(
+            "DELETE FROM responses WHERE key IN ("
+            "SELECT key FROM responses ORDER BY accessed DESC, rowid DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,),
+        )
+        self.evictions += max(cursor.rowcount, 0)
+
+    def clear(self):
+        """
+        Removes every cached response and resets the stats.
+
+        Returns:
+            None
+        """
+        with self._lock, self.conn:
+            self.conn.execute("DELETE FROM responses")
+        self.stats.clear()
+        self.evictions = 0
+
+    def __len__(self):
+        with self._lock:
+            return self.conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    def __del__(self):
+        """
+        Closes the database connection when the object is destroyed.
+
+        Returns:
+            None
+        """
+        self.conn.close()
@@ -0,0 +1,219 @@
+import hashlib
+import json
+import time
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterator, Optional, Tuple
+
+from metaloom.base import metrics
+from metaloom.base.cache import ResponseCache
+from metaloom.base.metrics import MetricsHook, estimate_tokens
+from metaloom.base.policy import CallPolicy
+from metaloom.base.scheduler import CallScheduler, current_priority
+from metaloom.base.singleflight import SingleFlight
+
+if TYPE_CHECKING:
+    from metaloom.base.recording import Recorder
+
+
+def model_identity(llm) -> Tuple[str, Dict[str, Any]]:
+    """
+    Get the model name and generation parameters of an LLM.
+
+    Returns:
+        The model name and a dict of the remaining identifying parameters.
+    """
+    params = dict(getattr(llm, "_identifying_params", None) or {})
+    name = params.pop("model_name", None) or getattr(llm, "model_name", None) or type(llm).__name__
+    return str(name), params
+
+
+def prompt_text(prompt: Any) -> str:
+    """
+    Get the rendered text of a prompt, a prompt value or a list of messages.
+    """
+    if isinstance(prompt, str):
+        return prompt
+    if hasattr(prompt, "to_string"):
+        return prompt.to_string()
+    if isinstance(prompt, (list, tuple)):
+        return "\n".join(f"{getattr(m, 'type', '')}: {getattr(m, 'content', m)}" for m in prompt)
+    return str(prompt)
+
+
+def request_key(llm, prompt: Any) -> str:
+    """
+    Hash of the rendered prompt, model name and generation parameters of a call.
+    """
+    name, params = model_identity(llm)
+    payload = json.dumps([prompt_text(prompt), name, params], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def response_text(response: Any) -> str:
+    return getattr(response, "content", response)
+
+
+class LLMCaller:
+    """
+    The single place runners and chains send prompts to a model.
+
+    Attributes:
+        cache: Optional `ResponseCache`; calls answered from it skip the network.
+        policy: Optional `CallPolicy` with the deadline, retry and hedging rules for each call.
+        singleflight: Optional `SingleFlight`; identical concurrent calls share one model request.
+        scheduler: Optional `CallScheduler` with the rate limits and priority classes every
+            request (including retries and hedges) goes through.
+        recorder: Optional `Recorder` that saves every request sent to the model, with its
+            response and latency, for offline replay.
+        metrics: `MetricsHook` that receives a record for every call; does nothing by default.
+        token_counter: Counts prompt and completion tokens for the metrics.
+
+    Methods:
+        __call__: Send a prompt to the model, going through the configured layers.
+        stream: Stream a prompt's response from the model.
+        call: Send a prompt straight to the model.
+    """
+
+    def __init__(
+        self,
+        cache        : Optional[ResponseCache]         = None,
+        policy       : Optional[CallPolicy]            = None,
+        metrics      : Optional[MetricsHook]           = None,
+        token_counter: Callable[[str], int]            = estimate_tokens,
+        singleflight : Optional[SingleFlight]          = None,
+        scheduler    : Optional[CallScheduler]         = None,
+        recorder     : Optional["Recorder"]            = None,
+        ) -> None:
+        self.cache = cache
+        self.policy = policy
+        self.singleflight = singleflight
+        self.scheduler = scheduler
+        self.recorder = recorder
+        self.metrics = metrics or MetricsHook()
+        self.token_counter = token_counter
+
+    def _record(self, step: str, prompt: Any, text: str, started: float, cache_hit: bool, coalesced: bool = False) -> None:
+        record = {
+            "step"             : step,
+            "elapsed"          : time.perf_counter() - started,
+            "prompt_tokens"    : self.token_counter(prompt_text(prompt)),
+            "completion_tokens": self.token_counter(text),
+            "cache_hit"        : cache_hit,
+            "coalesced"        : coalesced,
+        }
+        metrics.add(
+            llm_calls         = 1,
+            prompt_tokens     = record["prompt_tokens"],
+            completion_tokens = record["completion_tokens"],
+            cache_hits        = int(cache_hit),
+            coalesced         = int(coalesced),
+        )
+        self.metrics.on_call(record)
+
+    def __call__(self, llm, prompt: Any, step: str = "", parse: Optional[Callable[[str], Any]] = None) -> Any:
+        """
+        Send a prompt to the model.
+
+        Args:
+            llm: The LLM object.
+            prompt: A string, prompt value or list of messages.
+            step: Name of the step making the call, used for stats.
+            parse: Decodes the response, raising if it is unusable. A response is only
+                cached once it has parsed, and a cached one that no longer parses is dropped.
+
+        Returns:
+            The raw response text, or what `parse` returned for it.
+        """
+        started   = time.perf_counter()
+        cached    = None
+        coalesced = False
+        with metrics.phase("llm"):
+            key = request_key(llm, prompt) if self.cache is not None or self.singleflight is not None else None
+            if self.cache is not None:
+                cached = self.cache.get(key, step)
+            if cached is not None:
+                text = cached
+            elif self.singleflight is not None:
+                text, coalesced = self.singleflight.do(key, lambda: self.call(llm, prompt, step))
+            else:
+                text = self.call(llm, prompt, step)
+        self._record(step, prompt, text, started, cached is not None, coalesced)
+        result = text
+        if parse is not None:
+            try:
+                result = parse(text)
+            except Exception:
+                if cached is not None:
+                    self.cache.delete(key)
+                raise
+        if self.cache is not None and cached is None and not coalesced:
+            self.cache.set(key, text, step)
+        return result
+
+    def stream(self, llm, prompt: Any, step: str = "", parse: Optional[Callable[[str], Any]] = None) -> Iterator[str]:
+        """
+        Stream a prompt's response from the model, chunk by chunk.
+
+        A cached response is yielded as a single chunk, and dropped if `parse` rejects it. A
+        streamed response is cached once complete, and once `parse` accepts it if given.
+
+        Args:
+            llm: The LLM object.
+            prompt: A string, prompt value or list of messages.
+            step: Name of the step making the call, used for stats.
+            parse: Decodes the complete response, raising if it is unusable.
+
+        Yields:
+            Pieces of the raw response text.
+        """
+        started = time.perf_counter()
+        key = request_key(llm, prompt) if self.cache is not None else None
+        if key is not None:
+            cached = self.cache.get(key, step)
+            if cached is not None:
+                self._record(step, prompt, cached, started, True)
+                yield cached
+                if parse is not None:
+                    try:
+                        parse(cached)
+                    except Exception:
+                        self.cache.delete(key)
+                        raise
+                return
+        chunks = []
+        if self.scheduler is not None:
+            self.scheduler.acquire(tokens=self.token_counter(prompt_text(prompt)))
+        for chunk in llm.stream(prompt):
+            chunks.append(response_text(chunk))
+            yield chunks[-1]
+        text = "".join(chunks)
+        if self.recorder is not None:
+            self.recorder.record(llm, prompt, text, time.perf_counter() - started, step)
+        if self.scheduler is not None:
+            self.scheduler.charge(self.token_counter(text))
+        self._record(step, prompt, text, started, False)
+        if parse is not None:
+            parse(text)
+        if key is not None:
+            self.cache.set(key, text, step)
+
+    def call(self, llm, prompt: Any, step: str = "") -> str:
+        started = time.perf_counter()
+        send = lambda: response_text(llm.invoke(prompt))
+        if self.scheduler is not None:
+            send = self._scheduled(send, prompt)
+        text = send() if self.policy is None else self.policy.run(send)
+        if self.recorder is not None:
+            self.recorder.record(llm, prompt, text, time.perf_counter() - started, step)
+        return text
+
+    def _scheduled(self, send: Callable[[], str], prompt: Any) -> Callable[[], str]:
+        # The priority is read here because policy attempts run on pool threads.
+        priority = current_priority()
+        tokens   = self.token_counter(prompt_text(prompt))
+
+        def run() -> str:
+            text = self.scheduler.run(send, priority, tokens)
+            self.scheduler.charge(self.token_counter(text))
+            return text
+
+        return run
@@ -0,0 +1,186 @@
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Dict, Optional
+
+
+class CheckpointStore:
+    """
+    Persists chain runs step by step in an SQLite database, so a failed or interrupted run
+    can be resumed from its first incomplete step with `RunnableChain.resume_chain`.
+
+    For every step the store keeps the transformed inputs as soon as they are known, and
+    the full step record once the step completes. Values are stored as JSON; values JSON
+    cannot represent are stored as their `str()`.
+
+    Examples:
+        STORE = CheckpointStore("runs.db")
+        CHAIN = RunnableChain(llm, checkpoints=STORE)
+        try:
+            CHAIN.call_chain("long_chain", topic="cats")
+        except Exception as e:
+            BUS = CHAIN.resume_chain(e.run_id)
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._create_tables()
+
+    def _create_tables(self):
+        """
+        Creates the run and step tables if needed.
+
+        Returns:
+            None
+        """
+        with self.conn:
+            self.conn.execute(
+                """CREATE TABLE IF NOT EXISTS runs (
+                id TEXT PRIMARY KEY,
+                chain_name TEXT NOT NULL,
+                kwargs TEXT NOT NULL,
+                status TEXT NOT NULL,
+                created REAL NOT NULL,
+                updated REAL NOT NULL
+            )"""
+            )
+            self.conn.execute(
+                """CREATE TABLE IF NOT EXISTS steps (
+                run_id TEXT NOT NULL,
+                idx INTEGER NOT NULL,
+                name TEXT NOT NULL,
+                inputs TEXT,
+                record TEXT,
+                PRIMARY KEY(run_id, idx),
+                FOREIGN KEY(run_id) REFERENCES runs(id)
+            )"""
+            )
+
+    @staticmethod
+    def _dumps(value: Any) -> str:
+        return json.dumps(value, default=str)
+
+    def start_run(self, chain_name: str, kwargs: Dict[str, Any]) -> str:
+        """
+        Records a new run.
+
+        Args:
+            chain_name (str): The chain being run.
+            kwargs (dict): The chain inputs.
+
+        Returns:
+            str: The run ID.
+        """
+        run_id = str(uuid.uuid4())
+        now = time.time()
+        with self._lock, self.conn:
+            self.conn.execute(
+                "INSERT INTO runs (id, chain_name, kwargs, status, created, updated) VALUES (?, ?, ?, ?, ?, ?)",
+                (run_id, chain_name, self._dumps(kwargs), "running", now, now),
+            )
+        return run_id
+
+    def set_status(self, run_id: str, status: str):
+        """
+        Updates the status of a run ("running", "failed" or "done").
+
+        Returns:
+            None
+        """
+        with self._lock, self.conn:
+            self.conn.execute("UPDATE runs SET status = ?, updated = ? WHERE id = ?", (status, time.time(), run_id))
+
+    def save_inputs(self, run_id: str, idx: int, name: str, inputs: Any):
+        """
+        Stores the transformed inputs of a step before it is invoked.
+
+        Returns:
+            None
+        """
+        with self._lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO steps (run_id, idx, name, inputs, record) VALUES (?, ?, ?, ?, NULL)",
+                (run_id, idx, name, self._dumps(inputs)),
+            )
+
+    def save_step(self, run_id: str, idx: int, name: str, record: Dict[str, Any]):
+        """
+        Stores the record of a completed step.
+
+        Returns:
+            None
+        """
+        with self._lock, self.conn:
+            self.conn.execute(
+                "INSERT INTO steps (run_id, idx, name, record) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(run_id, idx) DO UPDATE SET record = excluded.record",
+                (run_id, idx, name, self._dumps(record)),
+            )
+            self.conn.execute("UPDATE runs SET updated = ? WHERE id = ?", (time.time(), run_id))
+
+    def get_run(self, run_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Retrieves a run.
+
+        Returns:
+            dict: The run's chain name, kwargs and status, or None if it does not exist.
+        """
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT id, chain_name, kwargs, status, created, updated FROM runs WHERE id = ?", (run_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        return {
+            "id": row[0],
+            "chain_name": row[1],
+            "kwargs": json.loads(row[2]),
+            "status": row[3],
+            "created": row[4],
+            "updated": row[5],
+        }
+
+    def get_steps(self, run_id: str) -> Dict[int, Dict[str, Any]]:
+        """
+        Retrieves the saved steps of a run.
+
+        Returns:
+            dict: Step index -> {"name", "inputs", "record"}; `record` is None for steps
+            whose inputs were saved but that did not complete.
+        """
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT idx, name, inputs, record FROM steps WHERE run_id = ? ORDER BY idx", (run_id,)
+            ).fetchall()
+        return {
+            row[0]: {
+                "name": row[1],
+                "inputs": json.loads(row[2]) if row[2] is not None else None,
+                "record": json.loads(row[3]) if row[3] is not None else None,
+            }
+            for row in rows
+        }
+
+    def delete_run(self, run_id: str):
+        """
+        Deletes a run and its steps.
+
+        Returns:
+            None
+        """
+        with self._lock, self.conn:
+            self.conn.execute("DELETE FROM steps WHERE run_id = ?", (run_id,))
+            self.conn.execute("DELETE FROM runs WHERE id = ?", (run_id,))
+
+    def __del__(self):
+        """
+        Closes the database connection when the object is destroyed.
+
+        Returns:
+            None
+        """
+        self.conn.close()
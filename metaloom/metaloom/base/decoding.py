@@ -0,0 +1,193 @@
+import inspect
+import json
+import re
+import threading
+from typing import Any, Dict, Optional
+
+try:
+    import orjson
+except ImportError:  # optional speedup
+    orjson = None
+
+
+_FENCE = re.compile(r"```[a-zA-Z]*\s*(.*?)```", re.S)
+_LITERALS = {"True": "true", "False": "false", "None": "null"}
+_LONG_INT = re.compile(r"\d{19,}")
+_WORD = re.compile(r"[^\W\d]+")
+
+_stats_lock = threading.Lock()
+DECODE_STATS: Dict[str, int] = {"clean": 0, "repaired": 0, "failed": 0}
+
+
+class CoercionError(ValueError):
+    pass
+
+
+def loads(text: str) -> Any:
+    """
+    Parse JSON with orjson when it is installed, falling back to `json`.
+
+    Text orjson rejects (such as `NaN`) is retried with `json`, and text with integers
+    too long for 64 bits skips orjson, which would not keep their precision.
+
+    Raises:
+        json.JSONDecodeError: The text is not valid JSON.
+    """
+    if orjson is not None and not _LONG_INT.search(text):
+        try:
+            return orjson.loads(text)
+        except orjson.JSONDecodeError:
+            pass
+    return json.loads(text)
+
+
+def repair(text: str) -> str:
+    """
+    Fix the formatting mistakes models commonly make in JSON output.
+
+    Strips markdown fences and surrounding prose, converts single-quoted strings and
+    Python literals, and drops trailing commas. Runs in a single pass over the text.
+    """
+    fenced = _FENCE.search(text)
+    if fenced:
+        text = fenced.group(1)
+    starts = [i for i in (text.find("{"), text.find("[")) if i >= 0]
+    if not starts:
+        return text
+    text = text[min(starts):max(text.rfind("}"), text.rfind("]")) + 1]
+
+    out = []
+    quote = None
+    i = 0
+    while i < len(text):
+        char = text[i]
+        if quote is not None:
+            if char == "\\" and i + 1 < len(text):
+                pair = text[i:i + 2]
+                out.append("'" if pair == "\\'" else pair)
+                i += 2
+                continue
+            if char == quote:
+                out.append('"')
+                quote = None
+            elif char == '"':
+                out.append('\\"')
+            elif char == "\n":
+                out.append("\\n")
+            else:
+                out.append(char)
+        elif char in "\"'":
+            quote = char
+            out.append('"')
+        elif char == ",":
+            j = i + 1
+            while j < len(text) and text[j].isspace():
+                j += 1
+            if j == len(text) or text[j] not in "}]":
+                out.append(char)
+        elif char.isalpha() or char == "_":
+            word = _WORD.match(text, i).group(0)
+            out.append(_LITERALS.get(word, word))
+            i += len(word)
+            continue
+        else:
+            out.append(char)
+        i += 1
+    return "".join(out)
+
+
+def coerce(value: Any, annotation: Any) -> Any:
+    """
+    Coerce a value to a parameter annotation.
+
+    Only plain `str`, `int`, `float`, `bool`, `list` and `dict` annotations are coerced,
+    anything else is passed through unchanged.
+
+    Raises:
+        CoercionError: The value cannot be represented as the annotated type.
+    """
+    if annotation in (inspect.Parameter.empty, Any) or not isinstance(annotation, type):
+        return value
+    if isinstance(value, annotation) and not (annotation is int and isinstance(value, bool)):
+        return value
+    try:
+        if annotation is str:
+            return json.dumps(value) if isinstance(value, (dict, list)) else str(value)
+        if annotation is bool:
+            if isinstance(value, str) and value.strip().lower() in ("true", "yes", "1", "false", "no", "0"):
+                return value.strip().lower() in ("true", "yes", "1")
+            if isinstance(value, (int, float)):
+                return bool(value)
+        if annotation is int:
+            if isinstance(value, float) and value.is_integer():
+                return int(value)
+            if isinstance(value, str):
+                return int(value.strip())
+        if annotation is float and isinstance(value, (int, str)) and not isinstance(value, bool):
+            return float(value)
+        if annotation in (list, dict) and isinstance(value, str):
+            parsed = loads(value)
+            if isinstance(parsed, annotation):
+                return parsed
+        if annotation is list and isinstance(value, tuple):
+            return list(value)
+    except (TypeError, ValueError) as e:
+        raise CoercionError(f"Cannot coerce {value!r} to {annotation.__name__}") from e
+    raise CoercionError(f"Cannot coerce {value!r} to {annotation.__name__}")
+
+
+def coerce_fields(data: Any, signature: Optional[inspect.Signature]) -> Any:
+    """
+    Coerce the fields of a decoded object (or of each object in a list) to a function signature.
+    Fields that are not parameters, or cannot be coerced, are left as they are.
+    """
+    if signature is None:
+        return data
+    if isinstance(data, list):
+        return [coerce_fields(item, signature) for item in data]
+    if not isinstance(data, dict):
+        return data
+    params = signature.parameters
+    coerced = {}
+    for key, value in data.items():
+        try:
+            coerced[key] = coerce(value, params[key].annotation) if key in params else value
+        except CoercionError:
+            coerced[key] = value
+    return coerced
+
+
+def decode(text: str, signature: Optional[inspect.Signature] = None) -> Any:
+    """
+    Decode model output as JSON, repairing it if needed, and coerce it to a signature.
+
+    Args:
+        text: The raw model output.
+        signature: The signature of the function that will receive the fields.
+
+    Returns:
+        The decoded value.
+
+    Raises:
+        json.JSONDecodeError: The text could not be decoded even after repair.
+    """
+    try:
+        data, outcome = loads(text), "clean"
+    except json.JSONDecodeError:
+        try:
+            data, outcome = loads(repair(text)), "repaired"
+        except json.JSONDecodeError:
+            with _stats_lock:
+                DECODE_STATS["failed"] += 1
+            raise
+    with _stats_lock:
+        DECODE_STATS[outcome] += 1
+    return coerce_fields(data, signature)
+
+
+def decode_stats() -> Dict[str, int]:
+    """
+    How many responses decoded cleanly, were saved by repair, or failed.
+    """
+    with _stats_lock:
+        return dict(DECODE_STATS)
@@ -0,0 +1,149 @@
+import os
+import threading
+from collections import deque
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Deque, Dict, Iterable, Iterator, List, Optional
+
+EXECUTORS = ("inline", "thread", "process")
+
+DEFAULT_THREADS = 8
+
+_POOLS: Dict[Optional[int], ProcessPoolExecutor] = {}
+_LOCK = threading.Lock()
+
+
+def check_executor(executor: str) -> str:
+    if executor not in EXECUTORS:
+        raise ValueError(f"Executor '{executor}' does not exist, choose one of {list(EXECUTORS)}")
+    return executor
+
+
+def process_pool(max_workers: Optional[int] = None) -> ProcessPoolExecutor:
+    """
+    The shared process pool for `max_workers` (one per CPU by default), started on first use.
+    """
+    with _LOCK:
+        if max_workers not in _POOLS:
+            _POOLS[max_workers] = ProcessPoolExecutor(max_workers=max_workers)
+        return _POOLS[max_workers]
+
+
+def _apply(function: Callable[..., Any], kwargs: Dict[str, Any]) -> Any:
+    return function(**kwargs)
+
+
+def run_in_process(function: Callable[..., Any], kwargs: Dict[str, Any], max_workers: Optional[int] = None) -> Any:
+    """
+    Call `function(**kwargs)` in a worker process. The function must be importable by the
+    workers (defined at module level) and its inputs and output picklable.
+    """
+    return process_pool(max_workers).submit(_apply, function, kwargs).result()
+
+
+def map_in_process(
+    function   : Callable[..., Any],
+    items      : Iterable[Dict[str, Any]],
+    max_workers: Optional[int] = None,
+    ) -> List[Any]:
+    """
+    Call `function(**item)` for every item across the worker processes.
+
+    Returns:
+        The results, in the order of `items`.
+    """
+    items = list(items)
+    workers = max_workers or os.cpu_count() or 1
+    chunksize = max(1, len(items) // (workers * 4))
+    return list(process_pool(max_workers).map(_apply, [function] * len(items), items, chunksize=chunksize))
+
+
+def _run_inline(function: Callable[..., Any], item: Dict[str, Any], capture_errors: bool) -> Any:
+    try:
+        return function(**item)
+    except Exception as e:
+        if not capture_errors:
+            raise
+        return e
+
+
+def _result(future: "Future[Any]", capture_errors: bool) -> Any:
+    try:
+        return future.result()
+    except Exception as e:
+        if not capture_errors:
+            raise
+        return e
+
+
+def iter_map(
+    function      : Callable[..., Any],
+    items         : Iterable[Dict[str, Any]],
+    executor      : str           = "inline",
+    max_workers   : Optional[int] = None,
+    capture_errors: bool          = False,
+    ) -> Iterator[Any]:
+    """
+    Call `function(**item)` for every item, yielding results in the order of `items` as
+    soon as each one and those before it are done. At most twice `max_workers` items are
+    in flight, so long or lazy item streams are consumed as results are taken.
+
+    Args:
+        executor: "inline", "thread" for a bounded thread pool (I/O-bound functions), or
+            "process" for the shared process pool (CPU-bound functions).
+        max_workers: Pool size; `DEFAULT_THREADS` threads or one process per CPU by default.
+        capture_errors: Yield the exception raised for an item in its place instead of
+            raising it and abandoning the rest.
+
+    Yields:
+        The result, or exception, for each item.
+    """
+    if check_executor(executor) == "inline":
+        for item in items:
+            yield _run_inline(function, item, capture_errors)
+        return
+
+    pool: Executor
+    if executor == "thread":
+        pool = ThreadPoolExecutor(max_workers=max_workers or DEFAULT_THREADS, thread_name_prefix="metaloom-map")
+        window = 2 * (max_workers or DEFAULT_THREADS)
+    else:
+        pool = process_pool(max_workers)
+        window = 2 * (max_workers or os.cpu_count() or 1)
+    pending: Deque["Future[Any]"] = deque()
+    try:
+        for item in items:
+            pending.append(pool.submit(_apply, function, item))
+            if len(pending) >= window:
+                yield _result(pending.popleft(), capture_errors)
+        while pending:
+            yield _result(pending.popleft(), capture_errors)
+    finally:
+        for future in pending:
+            future.cancel()
+        if executor == "thread":
+            pool.shutdown(wait=False)
+
+
+def ordered_map(
+    function      : Callable[..., Any],
+    items         : Iterable[Dict[str, Any]],
+    executor      : str           = "inline",
+    max_workers   : Optional[int] = None,
+    capture_errors: bool          = False,
+    ) -> List[Any]:
+    """
+    `iter_map` collected into a list.
+    """
+    if executor == "process" and not capture_errors:
+        return map_in_process(function, items, max_workers)
+    return list(iter_map(function, items, executor, max_workers, capture_errors))
+
+
+def shutdown() -> None:
+    """
+    Stop the shared process pools.
+    """
+    with _LOCK:
+        for pool in _POOLS.values():
+            pool.shutdown()
+        _POOLS.clear()
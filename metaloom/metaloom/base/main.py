@@ -1,23 +1,32 @@
 import inspect
 import json
 import logging
+import time
 from types import MappingProxyType
-from typing import Any, Callable, Dict, List, Optional
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from functools import lru_cache
+from typing import TYPE_CHECKING, Any, AsyncIterator, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
 
-from langchain.chains.llm import LLMChain as Chain
-from langchain.llms.openai import OpenAIChat as LLM
-from langchain_core.output_parsers import JsonOutputParser
-from langchain.output_parsers import PydanticOutputParser
-from langchain_core.prompts import ChatPromptTemplate, PromptTemplate
-from langchain_core.load import load, mapping
-from pydantic import create_model
-from pydantic.v1 import BaseModel
+from metaloom.base import executors, metrics
+from metaloom.base.adapter import SchemaAdapter
+from metaloom.base.bus import Bus, Retention
+from metaloom.base.calls import LLMCaller
+from metaloom.base.checkpoint import CheckpointStore
+from metaloom.base.decoding import coerce_fields, decode
+from metaloom.base.routing import ModelRouter
+from metaloom.base.streaming import IncrementalJSONParser
+
+# langchain, pydantic and the model clients are imported where they are first used,
+# so importing this module stays cheap and does not need credentials.
+if TYPE_CHECKING:
+    from langchain_core.runnables import Runnable
+    from pydantic.v1 import BaseModel
 
 
 
 # Configure logging
 # logging.basicConfig(level=logging.INFO)
-#LOGGER = logging.getLogger('metaloom')
+LOGGER = logging.getLogger('metaloom')
 
 
 from functools import wraps
@@ -25,14 +34,14 @@ from functools import wraps
 from types import MappingProxyType
 
 def create(name: str, func: Callable) -> Any:
+    from pydantic import create_model
+
     params : MappingProxyType[str, inspect.Parameter] = inspect.signature(func).parameters
     fields = {k : (v.annotation.__name__, v.default) for k, v in params.items()}
     model = create_model(name, field_definitions=dict(fields))
     model.model_config = {'extra' : 'allow'}
     return model
 
-Output : BaseModel  = create("Output", inspect.formatargvalues)
-
 
 
 def p(func: Callable):
@@ -44,7 +53,7 @@ def p(func: Callable):
     return wrapper
 
 
-def convert_quotes(json_str: str) -> Dict[str, Any]:
+def convert_quotes(json_str: str, signature: Optional[inspect.Signature] = None) -> Dict[str, Any]:
 
     @staticmethod
     def parse_value(value: str) -> Any:
@@ -62,13 +71,46 @@ def convert_quotes(json_str: str) -> Dict[str, Any]:
         return value
 
     try:
-        json_dict = json.loads(json_str)
-        return {key: parse_value(value) for key, value in json_dict.items()}
+        json_dict = decode(json_str, signature)
+        if signature is not None:
+            return json_dict
+        return {key: parse_value(value) if isinstance(value, str) else value for key, value in json_dict.items()}
     except json.JSONDecodeError as e:
         #LOGGER.error("Failed to convert JSON string: {}", json_str)
         raise e
 
 
+def timings(started: float) -> Dict[str, float]:
+    finished = time.time()
+    return {"started": started, "finished": finished, "elapsed": finished - started}
+
+
+def topological_order(nodes: List[str], edges: List[Tuple[str, str]]) -> List[str]:
+    """
+    Order graph nodes so that every node comes after its upstream nodes.
+
+    Raises:
+        ValueError: The edges contain a cycle.
+    """
+    indegree = {node: 0 for node in nodes}
+    for _, downstream in edges:
+        indegree[downstream] += 1
+    ready = [node for node in nodes if indegree[node] == 0]
+    order = []
+    while ready:
+        node = ready.pop(0)
+        order.append(node)
+        for upstream, downstream in edges:
+            if upstream == node:
+                indegree[downstream] -= 1
+                if indegree[downstream] == 0:
+                    ready.append(downstream)
+    if len(order) != len(nodes):
+        cycle = [node for node in nodes if node not in order]
+        raise ValueError(f"Chain graph has a cycle through: {cycle}")
+    return order
+
+
 class RunnableFunction:
     """
     A class representing a runnable function.
@@ -77,6 +119,16 @@ class RunnableFunction:
         llm: The LLM object.
         function: The function to be invoked.
         input_template: The input template for the function.
+        name: The name the function is registered under, used for call stats.
+        caller: The `LLMCaller` used to send prompts to the model.
+        executor: Where the function body runs: "inline"; "thread", which maps list responses
+            over a bounded thread pool; or "process" for worker processes (the function must
+            be defined at module level, its inputs and output picklable).
+        max_workers: Pool size for the "thread" and "process" executors.
+        capture_errors: For list responses, put the exception raised for an item in its place
+            instead of failing the whole list.
+        router: Optional `ModelRouter`; invokes go to the model routed for this function and
+            escalate to `llm` if the answer cannot be parsed.
 
     Methods:
         get_function_params: Get the parameters of the function.
@@ -85,17 +137,38 @@ class RunnableFunction:
         get_placeholders: Get the placeholders for the input variables.
         get_example: Get an example of the function's input.
         invoke: Invoke the function with the given inputs.
+        invoke_fused: Fill the input template from raw data and invoke, in one model call.
+        stream: Invoke the function, streaming completed output fields.
+        parse_response: Parse the model's text and run the function on it.
+        decode_response: Parse the model's text.
+        handle_response: Run the function on a parsed response.
         process_response: Process the response returned by the function.
+        process_items: Run the function over list items, yielding results in order.
     """
     def __init__(
         self,
         llm,
         function,
         input_template: str,
+        name: Optional[str] = None,
+        caller: Optional[LLMCaller] = None,
+        executor: str = "inline",
+        max_workers: Optional[int] = None,
+        capture_errors: bool = False,
+        router: Optional[ModelRouter] = None,
     ) -> None:
         self.llm = llm
         self.function = function
         self.input_template = input_template
+        self.name = name or getattr(function, "__name__", "function")
+        self.caller = caller or LLMCaller()
+        self.executor = executors.check_executor(executor)
+        self.max_workers = max_workers
+        self.capture_errors = capture_errors
+        self.router = router
+        from langchain_core.output_parsers import PydanticOutputParser
+        from langchain_core.prompts import PromptTemplate
+
         self.prompt = PromptTemplate.from_template(template=input_template)
         self.output_parser = PydanticOutputParser
 
@@ -156,54 +229,112 @@ class RunnableFunction:
         Returns:
             The response returned by the function.
         """
-        response_vars = inspect.signature(self.function).parameters.keys()
-
-        def get_response_template()-> Dict[str, str]:
-            return {var: "{"+var+"}" for var in response_vars}
-
-        response_template = get_response_template()
-
-        prompt = ChatPromptTemplate.from_messages([(
-            "system",
-            """Ensure response is in json format and it is parseable by `json.loads`.
-                if there is no input or keys for output, pass an empty dictionary.
-                if there is a list of inputs, pass them as a list of dictionaries with the same keys.
-                if instructed on optional keys, omit optional keys not used""",
-                            ),
-                            ("ai", "What is the output format?"),
-                            (
-                            "user", """
-                Note: If any keys were mentioned as optional in the instructions and there is no sufficient data, those k/v pairs may be omitted,
-
-                # These are the keys for output to be used:\n{response_template}
-                """
-                    ), ("user", f"Input Request for the output Dict:\n{self.input_template}"
-                    )
-                ])
-
-        def create(name: str, func: Callable) -> Any:
-            params : MappingProxyType[str, inspect.Parameter] = inspect.signature(func).parameters
-            fields = {k : (v.annotation.__name__, v.default) for k, v in params.items()}
-            model = create_model(name, field_definitions=dict(fields))
-            model.model_config = {'extra' : 'allow'}
-            return model
+        prompt = self.prompt.format(**inputs)
+        with metrics.collect(self.name, self.caller.metrics):
+            parsed = self._routed(lambda llm: self.caller(llm, prompt, step=self.name, parse=self.decode_response))
+            return self.handle_response(inputs, parsed)
+
+    def _routed(self, attempt: Callable[[Any], Any]) -> Any:
+        # Only the model call and decoding are retried on another model; the function
+        # itself runs once, outside the router.
+        if self.router is None:
+            return attempt(self.llm)
+        return self.router.call("invoke", self.name, attempt, self.llm)
+
+    def invoke_fused(self, data: Any) -> Any:
+        """
+        Fill the input template from another step's output and answer it in a single model
+        call, instead of transforming the data first and invoking on the result.
 
-        Output : type[BaseModel]  = create("Output", self.function)
+        Args:
+            data: The previous step's output.
 
-        chain = Chain(
-            llm=self.llm,
-            prompt=self.prompt,
-            output_parser=self.output_parser(pydantic_object = Output),
+        Returns:
+            The response returned by the function.
+        """
+        response_vars = list(inspect.signature(self.function).parameters.keys())
+        prompt = (
+            "Fill in this request template from the input data, then answer the filled-in request.\n"
+            f"request template: {self.input_template}\n"
+            f"input data: {data}\n"
+            f"Return ONLY a JSON object parseable by `json.loads`, with these output keys: {response_vars}"
         )
+        with metrics.collect(self.name, self.caller.metrics):
+            parsed = self._routed(lambda llm: self.caller(llm, prompt, step=f"fused:{self.name}", parse=self.decode_response))
+            return self.handle_response(data if isinstance(data, dict) else {}, parsed)
+
+    def stream(
+        self,
+        inputs  : Dict[str, Any],
+        needs   : Optional[List[str]] = None,
+        on_ready: Optional[Callable[[Dict[str, Any]], Any]] = None,
+        ) -> Iterator[Dict[str, Any]]:
+        """
+        Invoke the function, streaming the model's JSON as it is generated.
+
+        Field events and `on_ready` are available on the runner only: `stream_chain` yields
+        whole step records.
+
+        Args:
+            inputs: The inputs for the function.
+            needs: Output fields that `on_ready` waits for; every field of the object if not given.
+            on_ready: Called once with the `needs` fields as soon as they are all complete,
+                so dependent work can start before the generation ends.
+
+        Yields:
+            `{"field": key, "value": value}` for each top-level field as it completes,
+            then `{"output": response}` with the processed response.
+        """
+        parser  = IncrementalJSONParser()
+        ready   = on_ready is None
+        decoded = []
+        for chunk in self.caller.stream(self.llm, self.prompt.format(**inputs), step=self.name, parse=lambda text: decoded.append(self.decode_response(text))):
+            completed = parser.feed(chunk)
+            if not ready and (set(needs).issubset(parser.fields) if needs else parser.done):
+                ready = True
+                on_ready({k: parser.fields[k] for k in needs} if needs else dict(parser.fields))
+            for key, value in completed:
+                yield {"field": key, "value": value}
+        yield {"output": self.handle_response(inputs, decoded[-1])}
+
+    def parse_response(self, inputs: Dict[str, Any], text: str) -> Any:
+        """
+        Parse the model's text and run the function on it.
+
+        Args:
+            inputs: The inputs the prompt was rendered with.
+            text: The raw model response.
+
+        Returns:
+            The processed response.
+        """
+        return self.handle_response(inputs, self.decode_response(text))
 
-        if len(response_vars) == 0:
-            chain.return_final_only = True
+    def decode_response(self, text: str) -> Any:
+        """
+        Decode the model's text, without running the function.
 
-        response = chain.invoke({**inputs})
+        Raises:
+            Exception: The text cannot be parsed.
+        """
+        Output : type[BaseModel]  = create("Output", self.function)
+
+        with metrics.phase("parse"):
+            try:
+                return decode(text, self.get_function_params())
+            except json.JSONDecodeError:
+                return self.output_parser(pydantic_object = Output).parse(text)
+
+    def handle_response(self, inputs: Dict[str, Any], parsed: Any) -> Any:
+        """
+        Run the function on a decoded response.
+        """
+        response_vars = inspect.signature(self.function).parameters.keys()
+        response = {**inputs, "text": parsed}
         if response_vars  and 'chain_name' in response_vars:
             return self.function(chain_name=response_vars['chain_name'], kwargs = response)
 
-        print(response)
+        LOGGER.debug("%s response: %s", self.name, response)
         return self.process_response(response)
 
     def process_response(self, response: Dict[str, Any]) -> Any:
@@ -226,17 +357,33 @@ class RunnableFunction:
         #LOGGER.info("Response data: {}", response_data)
 
         if isinstance(response_data, dict):
+            if self.executor == "process":
+                return executors.run_in_process(self.function, response_data, self.max_workers)
             return self.function(**response_data)
 
         if isinstance(response_data, str):
             try:
-                return convert_quotes(response_data)
+                return convert_quotes(response_data, self.get_function_params())
             except json.JSONDecodeError as e:
                 #LOGGER.error("Failed to convert JSON string: {}", response_data)
                 raise e
 
         if isinstance(response_data, list):
-            return [self.function(**data) for data in response_data if isinstance(data, dict)]
+            items = [data for data in response_data if isinstance(data, dict)]
+            return executors.ordered_map(self.function, items, self.executor, self.max_workers, self.capture_errors)
+
+    def process_items(self, items: Iterable[Dict[str, Any]]) -> Iterator[Any]:
+        """
+        Run the function over list items with the runner's executor, yielding each result
+        in order as soon as it is ready. Suited to very long lists.
+
+        Args:
+            items: Keyword arguments for each call.
+
+        Yields:
+            The result, or the captured exception, for each item.
+        """
+        return executors.iter_map(self.function, items, self.executor, self.max_workers, self.capture_errors)
 
 
 class RunnableLambda(RunnableFunction):
@@ -247,8 +394,17 @@ class RunnableLambda(RunnableFunction):
         function                              ,
         input_template : str                  ,
         description    : Optional[str] = None ,
-        example        : Optional[str] = None ) -> None:
-        super().__init__(llm, function, input_template)
+        example        : Optional[str] = None ,
+        name           : Optional[str] = None ,
+        caller         : Optional[LLMCaller] = None ,
+        executor       : str           = "inline",
+        max_workers    : Optional[int] = None ,
+        capture_errors : bool          = False ,
+        router         : Optional[ModelRouter] = None ) -> None:
+        super().__init__(
+            llm, function, input_template, name=name, caller=caller,
+            executor=executor, max_workers=max_workers, capture_errors=capture_errors, router=router,
+        )
         self.description = description
         self.example = example
 
@@ -261,10 +417,27 @@ class RunnableLambda(RunnableFunction):
 
 class RunnableChain:
 
-    def __init__(self, llm) -> None:
+    def __init__(
+        self,
+        llm,
+        caller : Optional[LLMCaller]     = None,
+        adapter: Optional[SchemaAdapter] = None,
+        max_workers: Optional[int]       = None,
+        checkpoints: Optional[CheckpointStore] = None,
+        batch_transforms: bool           = True,
+        router     : Optional[ModelRouter] = None,
+        retention  : Optional[Retention]   = None,
+        ) -> None:
         self.function_mapping: Dict[str, Dict[str, Any]] = {}
         self.chains: Dict[str, Dict[str, Any]] = {}
         self.llm = llm
+        self.caller = caller or LLMCaller()
+        self.adapter = adapter or SchemaAdapter()
+        self.max_workers = max_workers
+        self.checkpoints = checkpoints
+        self.batch_transforms = batch_transforms
+        self.router = router
+        self.retention = retention or Retention()
         self.runner = RunnableFunction
         self.add_function(
             "transform",
@@ -280,28 +453,55 @@ class RunnableChain:
         input_template: str,
         description   : Optional[str] = None,
         example       : Optional[str] = None,
+        executor      : str           = "inline",
+        max_workers   : Optional[int] = None,
+        capture_errors: bool          = False,
+        llm           : Any           = None,
         ) -> None     :
+        """
+        Register a function. With `executor="process"` its body runs in a shared process
+        pool, and list responses fan out across the workers; use it for CPU-heavy functions.
+        With `executor="thread"` list responses are mapped over a bounded thread pool, for
+        I/O-bound functions. `capture_errors` keeps failed list items as their exception.
+        `llm` runs this function on its own model instead of the chain's.
+        """
         self.function_mapping[name] = {
             "function"       : function        ,
             "input_template" : input_template  ,
             "description"    : description     ,
-            "example"        : example
+            "example"        : example         ,
+            "executor"       : executors.check_executor(executor),
+            "max_workers"    : max_workers     ,
+            "capture_errors" : capture_errors  ,
+            "llm"            : llm
         }
 
     def get_runner(self, func_name: str) -> RunnableFunction:
         if func_name not in self.function_mapping:
             raise KeyError(f"Function '{func_name}' does not exist")
         return self.runner(
-            llm=self.llm,
+            llm=self.function_mapping[func_name].get("llm") or self.llm,
             function=self.function_mapping[func_name]["function"],
             input_template=self.function_mapping[func_name]["input_template"],
+            name=func_name,
+            caller=self.caller,
+            executor=self.function_mapping[func_name].get("executor", "inline"),
+            max_workers=self.function_mapping[func_name].get("max_workers"),
+            capture_errors=self.function_mapping[func_name].get("capture_errors", False),
+            router=self.router,
         )
 
     def cue(self, func_name: str, kwargs: dict) -> Any:
         runnable = self.get_runner(func_name)
         return runnable.invoke(**kwargs)
 
-    def define_sequence_chain(self, chain_name: str, function_names: List[str]) -> None:
+    def define_sequence_chain(self, chain_name: str, function_names: List[str], fused: bool = False) -> None:
+        """
+        Define a chain that runs functions one after another, each fed the previous output.
+
+        With `fused`, a step whose inputs the schema adapter cannot map makes one model call
+        (`RunnableFunction.invoke_fused`) instead of a transform call followed by an invoke.
+        """
         if len(function_names) < 2:
             raise ValueError("Must have more than one function to make a chain sequence")
         function_set = set(function_names)
@@ -309,6 +509,8 @@ class RunnableChain:
         if not function_set.issubset(mapping_set):
             raise KeyError("One of the functions is not in the function mapping dict")
         self.chains[chain_name] = {"sequence": function_names}
+        if fused:
+            self.chains[chain_name]["fused"] = True
 
     def define_parallel_chain(self, chain_name: str, function_names: List[str]) -> None:
         if len(function_names) < 2:
@@ -319,7 +521,36 @@ class RunnableChain:
             raise KeyError("One of the functions is not in the function mapping dict")
         self.chains[chain_name] = {"parallel": function_names}
 
+    def define_dag_chain(
+        self,
+        chain_name: str,
+        nodes     : List[str],
+        edges     : List[Tuple[str, str]],
+        ) -> None :
+        """
+        Define a chain as a directed acyclic graph of functions.
+
+        Args:
+            chain_name: The name of the chain.
+            nodes: The function names in the graph.
+            edges: (upstream, downstream) pairs; a node runs once all of its upstream nodes have finished.
+        """
+        if len(nodes) < 2:
+            raise ValueError("Must have more than one function to make a dag chain")
+        if len(set(nodes)) != len(nodes):
+            raise ValueError("Each function can only appear once in a dag chain")
+        if not set(nodes).issubset(set(self.function_mapping)):
+            raise KeyError("One of the functions is not in the function mapping dict")
+        edges = [tuple(edge) for edge in edges]
+        for upstream, downstream in edges:
+            if upstream not in nodes or downstream not in nodes:
+                raise KeyError(f"Edge ({upstream!r}, {downstream!r}) refers to a function that is not a node")
+        topological_order(nodes, edges)
+        self.chains[chain_name] = {"dag": {"nodes": list(nodes), "edges": edges}}
+
     def transform_params(self, func_name: str, input_data: Dict[str, Any]) -> Dict[str, Any]:
+        from langchain_core.prompts import ChatPromptTemplate
+
         runnable = self.get_runner(func_name)
         inputs = runnable.get_inputs()
         prompt = ChatPromptTemplate.from_messages(
@@ -333,14 +564,6 @@ class RunnableChain:
             ]
             )
 
-
-        def create(name: str, func: Callable) -> Any:
-            params : MappingProxyType[str, inspect.Parameter] = inspect.signature(func).parameters
-            fields = {k : (v.annotation.__name__, v.default) for k, v in params.items()}
-            model = create_model(name, field_definitions=dict(fields))
-            model.model_config = {'extra' : 'allow'}
-            return model
-
         Output : BaseModel  = create("Output", runnable.function)
         class Output_Parser(Output.__class__):
             class Config:
@@ -353,20 +576,204 @@ class RunnableChain:
                 return Output.parse_obj(json_object)
 
         input_data = { "data": {**input_data}, "output_keys": inputs}
-        chain      = Chain ( llm = self.llm, prompt=prompt, output_parser=runnable.output_parser(pydantic_object=Output_Parser) )
-        out        = chain.invoke(input_data)
 
-        return out["text"] if "text" in out else {}
+        def parse(text: str) -> Dict[str, Any]:
+            try:
+                result = decode(text, runnable.get_function_params())
+            except json.JSONDecodeError:
+                result = runnable.output_parser(pydantic_object=Output_Parser).parse(text)
+            # Only a routed call has a bigger model to escalate to.
+            if self.router is not None and (not isinstance(result, dict) or not set(inputs).issubset(result)):
+                raise ValueError(f"Transform for '{func_name}' did not return the keys {inputs}")
+            return result
+
+        def attempt(llm) -> Dict[str, Any]:
+            return self.caller(llm, prompt.format_prompt(**input_data), step=f"transform:{func_name}", parse=parse)
+
+        if self.router is None:
+            return attempt(self.llm)
+        return self.router.call("transform", func_name, attempt, self.llm)
+
+    def transform_many(self, func_names: List[str], input_data: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+        """
+        Transform the same input data for several functions with a single model call.
+
+        Returns:
+            The inputs for each function whose slice of the answer has all of its input keys
+            and validates against its `Output` model; other functions are left out.
+        """
+        from langchain_core.prompts import ChatPromptTemplate
+
+        runners = {name: self.get_runner(name) for name in func_names}
+        prompt = ChatPromptTemplate.from_messages(
+            [("system", "Transform the input data for each target function. Return one JSON object keyed by "
+                        "target name, each value an object with that target's output keys. target keys: {targets}"),
+            ("user"   , "this is my input data: {data}")
+            ]
+            )
+        targets = {name: runner.get_inputs() for name, runner in runners.items()}
+
+        def parse(text: str) -> Dict[str, Dict[str, Any]]:
+            answer = decode(text)
+            if not isinstance(answer, dict):
+                raise ValueError("Batched transform did not return an object")
+
+            results: Dict[str, Dict[str, Any]] = {}
+            for name, runner in runners.items():
+                part = answer.get(name)
+                if not isinstance(part, dict) or not set(targets[name]).issubset(part):
+                    continue
+                part = coerce_fields(part, runner.get_function_params())
+                try:
+                    create("Output", runner.function).parse_obj(part)
+                except (TypeError, ValueError):
+                    continue
+                results[name] = part
+            if not results and self.router is not None:
+                raise ValueError("No slice of the batched transform validated")
+            return results
+
+        def attempt(llm) -> Dict[str, Dict[str, Any]]:
+            return self.caller(llm, prompt.format_prompt(data={**input_data}, targets=targets), step=f"transform:{'+'.join(func_names)}", parse=parse)
+
+        try:
+            if self.router is None:
+                return attempt(self.llm)
+            return self.router.call("transform", "+".join(func_names), attempt, self.llm)
+        except ValueError:
+            return {}
+
+    def prepare_many(self, producer: str, func_names: List[str], input_data: Any) -> Dict[str, Dict[str, Any]]:
+        """
+        `prepare_inputs` for several functions fed the same data. Functions the schema adapter
+        cannot serve share one `transform_many` call; slices of it that fail validation fall
+        back to a `transform_params` call of their own.
+        """
+        data    = {k: v for k, v in input_data.items() if k != "chain_name"} if isinstance(input_data, dict) else input_data
+        results : Dict[str, Dict[str, Any]] = {}
+        missing = []
+        for name in func_names:
+            runner = self.get_runner(name)
+            inputs = self.adapter.adapt(producer, name, data, runner.get_inputs(), runner.get_function_params())
+            if inputs is None:
+                missing.append(name)
+            else:
+                results[name] = inputs
+        batched = self.transform_many(missing, input_data) if len(missing) > 1 else {}
+        for name in missing:
+            inputs = batched.get(name)
+            if inputs is None:
+                inputs = self.transform_params(func_name=name, input_data=input_data)
+            self.adapter.learn(producer, name, data, inputs)
+            results[name] = inputs
+        return results
+
+    def prepare_inputs(self, producer: str, func_name: str, input_data: Any) -> Dict[str, Any]:
+        """
+        Map the output of `producer` onto the inputs of `func_name`, using the schema
+        adapter when the keys line up and `transform_params` when they do not.
+        """
+        runnable = self.get_runner(func_name)
+        data     = {k: v for k, v in input_data.items() if k != "chain_name"} if isinstance(input_data, dict) else input_data
+        with metrics.phase("transform"):
+            inputs = self.adapter.adapt(producer, func_name, data, runnable.get_inputs(), runnable.get_function_params())
+            if inputs is None:
+                inputs = self.transform_params(func_name=func_name, input_data=input_data)
+                self.adapter.learn(producer, func_name, data, inputs)
+        return inputs
 
     def call_chain(self, chain_name: str, **kwargs: Any) -> Any:
+        """
+        Run a chain and return its bus: the step records ordered by step index, kept
+        according to the chain's `retention`.
+        """
         if not isinstance(kwargs, dict):
             kwargs = {k: v for k, v in dict(kwargs).items() if v is not None}
+        bus = Bus(self.retention)
+        for step_info in self.stream_chain(chain_name, **kwargs):
+            bus.append(step_info)
+        return bus.steps()
+
+    def stream_chain(self, chain_name: str, **kwargs: Any) -> Iterator[Dict[int, Dict[str, Any]]]:
+        """
+        Run a chain, yielding each step record as soon as its step completes.
+
+        Each record has the same shape as an entry of the `call_chain` bus, plus a `timings`
+        dict with `started`, `finished` and `elapsed` seconds and a `metrics` dict with the
+        transform, LLM and parse time, token counts, retries and cache hits of the step.
+        Graph and parallel chains yield in completion order.
+
+        With a checkpoint store, the run is recorded, and an error raised by a failed run
+        carries the id to pass to `resume_chain` as `run_id`.
+        """
         if chain_name not in self.chains:
             raise KeyError(f"Chain '{chain_name}' does not exist")
-        chaintype  =  "parallel" if "parallel" in self.chains[chain_name] else "sequence"
-        links      =  self.chains[chain_name][chaintype]
-        bus        =  []
+        run_id = self.checkpoints.start_run(chain_name, kwargs) if self.checkpoints is not None else None
+        yield from self._stream_run(chain_name, kwargs, run_id, {})
+
+    def resume_chain(self, run_id: str) -> List[Dict[int, Dict[str, Any]]]:
+        """
+        Finish a checkpointed run. Completed steps are replayed from the store, marked
+        `"resumed": True`, and execution restarts at the first incomplete step, reusing its
+        transformed inputs if they were saved.
+
+        Returns:
+            The bus of the whole run.
+        """
+        if self.checkpoints is None:
+            raise ValueError("resume_chain needs a checkpoint store")
+        run = self.checkpoints.get_run(run_id)
+        if run is None:
+            raise KeyError(f"Run '{run_id}' does not exist")
+        if run["chain_name"] not in self.chains:
+            raise KeyError(f"Chain '{run['chain_name']}' does not exist")
+        self.checkpoints.set_status(run_id, "running")
+        bus = Bus(self.retention)
+        for step_info in self._stream_run(run["chain_name"], run["kwargs"], run_id, self.checkpoints.get_steps(run_id)):
+            bus.append(step_info)
+        return bus.steps()
+
+    def _stream_run(
+        self,
+        chain_name: str,
+        kwargs    : Dict[str, Any],
+        run_id    : Optional[str],
+        saved     : Dict[int, Dict[str, Any]],
+        ) -> Iterator[Dict[int, Dict[str, Any]]]:
+        try:
+            if "dag" in self.chains[chain_name]:
+                yield from self.stream_graph(kwargs=kwargs, run_id=run_id, saved=saved, **self.chains[chain_name]["dag"])
+            elif "parallel" in self.chains[chain_name]:
+                yield from self.stream_graph(kwargs=kwargs, nodes=self.chains[chain_name]["parallel"], edges=[], run_id=run_id, saved=saved)
+            else:
+                yield from self._stream_sequence(
+                    self.chains[chain_name]["sequence"], kwargs, run_id, saved, self.chains[chain_name].get("fused", False)
+                )
+        except Exception as e:
+            if run_id is not None:
+                self.checkpoints.set_status(run_id, "failed")
+                e.run_id = run_id
+            raise
+        if run_id is not None:
+            self.checkpoints.set_status(run_id, "done")
+
+    def _stream_sequence(
+        self,
+        links : List[str],
+        kwargs: Dict[str, Any],
+        run_id: Optional[str],
+        saved : Dict[int, Dict[str, Any]],
+        fused : bool = False,
+        ) -> Iterator[Dict[int, Dict[str, Any]]]:
+        producer   =  "input"
         for i, link in enumerate(links):
+            if saved.get(i, {}).get("record") is not None:
+                record   = {**saved[i]["record"], "resumed": True}
+                kwargs   = record["output"]
+                producer = link
+                yield {i: record}
+                continue
+            started = time.time()
             output = {}
             step_info = {
                 i:  {
@@ -381,25 +788,277 @@ class RunnableChain:
             if link not in self.chains:
                 kwargs.pop("chain_name")
 
-            if chaintype == "sequence":
-                inputs = self.transform_params(func_name=link, input_data=kwargs)
-                print(inputs)  # kwargs['chain_name'] = link
-                if "chain_name" in inputs:
-                    inputs.pop("chain_name")
+            with metrics.collect(link, self.caller.metrics) as step_metrics:
                 runnable = self.get_runner(link)
-                output = runnable.invoke(inputs)
-                kwargs = output
-            elif chaintype == "parallel":
-                # if isinstance(kwargs, dict):
-                inputs = self.transform_params(func_name=link, input_data=kwargs)
-                print(inputs)  # kwargs['chain_name'] = link
-                if isinstance(inputs, dict):
-                    runnable = self.get_runner(link)
+                inputs   = saved.get(i, {}).get("inputs")
+                if inputs is None and fused:
+                    data = {k: v for k, v in kwargs.items() if k != "chain_name"} if isinstance(kwargs, dict) else kwargs
+                    with metrics.phase("transform"):
+                        inputs = self.adapter.adapt(producer, link, data, runnable.get_inputs(), runnable.get_function_params())
+                    if inputs is None:
+                        step_info[i]["fused"] = True
+                        metrics.add(saved_calls=1)
+                        output = runnable.invoke_fused(data)
+                if not step_info[i].get("fused"):
+                    if inputs is None:
+                        inputs = self.prepare_inputs(producer, link, kwargs)
+                    if run_id is not None and saved.get(i, {}).get("inputs") is None:
+                        self.checkpoints.save_inputs(run_id, i, link, inputs)
+                    LOGGER.debug("%s inputs: %s", link, inputs)  # kwargs['chain_name'] = link
+                    if "chain_name" in inputs:
+                        inputs.pop("chain_name")
                     output = runnable.invoke(inputs)
+            kwargs = output
+            producer = link
             step_info[i]["output"] = output
+            step_info[i]["timings"] = timings(started)
+            step_info[i]["metrics"] = step_metrics
+            if run_id is not None:
+                self.checkpoints.save_step(run_id, i, link, step_info[i])
 
-            bus.append(step_info)
-        return bus
+            yield step_info
+
+    async def astream_chain(self, chain_name: str, **kwargs: Any) -> AsyncIterator[Dict[int, Dict[str, Any]]]:
+        """
+        Async variant of `stream_chain`; steps run on a worker thread so the event loop is not blocked.
+        """
+        import asyncio
+
+        steps = self.stream_chain(chain_name, **kwargs)
+        done  = object()
+        while True:
+            step_info = await asyncio.to_thread(next, steps, done)
+            if step_info is done:
+                return
+            yield step_info
+
+    def run_node(
+        self,
+        producer: str,
+        link    : str,
+        data    : Any,
+        run_id  : Optional[str] = None,
+        idx     : Optional[int] = None,
+        inputs  : Optional[Dict[str, Any]] = None,
+        ) -> Any:
+        if inputs is None:
+            inputs = self.prepare_inputs(producer, link, data)
+            if run_id is not None:
+                self.checkpoints.save_inputs(run_id, idx, link, inputs)
+        if not isinstance(inputs, dict):
+            return {}
+        return self.get_runner(link).invoke(inputs)
+
+    def call_graph(self, kwargs: Dict[str, Any], nodes: List[str], edges: List[Tuple[str, str]]) -> List[Dict[int, Dict[str, Any]]]:
+        """
+        Run a graph of functions to completion.
+
+        Returns:
+            The bus of step records, in node order.
+        """
+        bus = list(self.stream_graph(kwargs, nodes, edges))
+        return sorted(bus, key=lambda step_info: next(iter(step_info)))
+
+    def stream_graph(
+        self,
+        kwargs: Dict[str, Any],
+        nodes : List[str],
+        edges : List[Tuple[str, str]],
+        run_id: Optional[str] = None,
+        saved : Optional[Dict[int, Dict[str, Any]]] = None,
+        ) -> Iterator[Dict[int, Dict[str, Any]]]:
+        """
+        Run a graph of functions, starting each node as soon as all of its upstream nodes have
+        finished. Independent nodes run concurrently on a thread pool. Root nodes receive
+        `kwargs`; other nodes receive their upstream outputs merged in edge order, with
+        non-dict outputs stored under the upstream function's name.
+
+        Nodes with a `saved` checkpoint record are replayed instead of run.
+
+        Yields:
+            Step records, in completion order.
+        """
+        upstream   = {node: [a for a, b in edges if b == node] for node in nodes}
+        downstream = {node: [b for a, b in edges if a == node] for node in nodes}
+        outputs    : Dict[str, Any] = {}
+        saved      = saved or {}
+
+        for idx, node in enumerate(nodes):
+            if saved.get(idx, {}).get("record") is not None:
+                outputs[node] = saved[idx]["record"]["output"]
+                yield {idx: {**saved[idx]["record"], "resumed": True}}
+
+        def merge(node: str) -> Dict[str, Any]:
+            if not upstream[node]:
+                return dict(kwargs)
+            merged: Dict[str, Any] = {}
+            for name in upstream[node]:
+                if isinstance(outputs[name], dict):
+                    merged.update(outputs[name])
+                else:
+                    merged[name] = outputs[name]
+            return merged
+
+        def run(producer: str, node: str, data: Dict[str, Any], batch: Optional[Future]) -> Tuple[Any, Dict[str, float], Dict[str, Any]]:
+            started = time.time()
+            idx     = nodes.index(node)
+            inputs  = saved.get(idx, {}).get("inputs")
+            with metrics.collect(node, self.caller.metrics) as step_metrics:
+                if inputs is None and batch is not None:
+                    inputs = batch.result()[node]
+                    if run_id is not None:
+                        self.checkpoints.save_inputs(run_id, idx, node, inputs)
+                output = self.run_node(producer, node, data, run_id, idx, inputs)
+            return output, timings(started), step_metrics
+
+        def prepare_many(producer: str, group: List[str], data: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+            with metrics.collect(f"transform:{'+'.join(group)}", self.caller.metrics):
+                with metrics.phase("transform"):
+                    return self.prepare_many(producer, group, data)
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            pending: Dict[Future, Tuple[str, Dict[str, Any]]] = {}
+
+            def submit(ready: List[str]) -> None:
+                # Nodes fed the same upstream outputs share one batched transform; it is
+                # queued before them, so they never wait on a transform that has not started.
+                groups: Dict[str, List[str]] = {}
+                for node in ready:
+                    groups.setdefault("+".join(upstream[node]) or "input", []).append(node)
+                for producer, group in groups.items():
+                    data  = merge(group[0])
+                    fresh = [node for node in group if saved.get(nodes.index(node), {}).get("inputs") is None]
+                    batch = None
+                    if self.batch_transforms and len(fresh) > 1:
+                        batch = pool.submit(prepare_many, producer, fresh, data)
+                    for node in group:
+                        pending[pool.submit(run, producer, node, data, batch if node in fresh else None)] = (node, data)
+
+            submit([node for node in nodes if node not in outputs and all(name in outputs for name in upstream[node])])
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    node, data             = pending.pop(future)
+                    outputs[node], elapsed, step_metrics = future.result()
+                    submit([
+                        successor for successor in downstream[node]
+                        if all(name in outputs for name in upstream[successor])
+                    ])
+                    step_info = {
+                        nodes.index(node): {
+                            "name"   : node,
+                            "inputs" : data,
+                            "output" : outputs[node],
+                            "next"   : downstream[node] or None,
+                            "timings": elapsed,
+                            "metrics": step_metrics,
+                        }
+                    }
+                    if run_id is not None:
+                        self.checkpoints.save_step(run_id, nodes.index(node), node, step_info[nodes.index(node)])
+                    yield step_info
+
+    def compile(self, chain_name: str) -> "Runnable":
+        """
+        Build an LCEL runnable equivalent to a chain, so it gets LangChain's `batch`,
+        `abatch`, `astream` and `max_concurrency` handling and can be embedded in larger
+        LCEL pipelines. Each step adapts or transforms its inputs and invokes its function,
+        like `call_chain`: fused sequence steps answer in one call when the adapter cannot
+        map their inputs, and with `batch_transforms`, nodes fed the same upstream outputs
+        share one transform call.
+
+        Returns:
+            A runnable taking the chain kwargs. A sequence returns the last step's output;
+            parallel and graph chains return `{function name: output}` for every node.
+        """
+        from langchain_core.runnables import RunnableLambda as LCRunnableLambda
+        from langchain_core.runnables import RunnableParallel, RunnablePassthrough, RunnableSequence
+
+        if chain_name not in self.chains:
+            raise KeyError(f"Chain '{chain_name}' does not exist")
+        chain = self.chains[chain_name]
+
+        def step(producer: str, link: str, fused: bool = False) -> "Runnable":
+            def run(data: Any) -> Any:
+                data = dict(data) if isinstance(data, dict) else data
+                with metrics.collect(link, self.caller.metrics):
+                    if fused:
+                        runnable = self.get_runner(link)
+                        with metrics.phase("transform"):
+                            inputs = self.adapter.adapt(producer, link, data, runnable.get_inputs(), runnable.get_function_params())
+                        if inputs is None:
+                            metrics.add(saved_calls=1)
+                            return runnable.invoke_fused(data)
+                        return self.run_node(producer, link, data, inputs=inputs)
+                    return self.run_node(producer, link, data)
+            return LCRunnableLambda(run, name=link)
+
+        def group_step(producer: str, group: List[str]) -> "Runnable":
+            # Mirrors `stream_graph`: siblings fed the same data share one batched transform.
+            if not self.batch_transforms or len(group) < 2:
+                return RunnableParallel({node: step(producer, node) for node in group})
+
+            def prepare(data: Any) -> Dict[str, Any]:
+                with metrics.collect(f"transform:{'+'.join(group)}", self.caller.metrics):
+                    with metrics.phase("transform"):
+                        return {"data": data, "inputs": self.prepare_many(producer, group, data)}
+
+            def invoke(node: str) -> "Runnable":
+                def run(prepared: Dict[str, Any]) -> Any:
+                    with metrics.collect(node, self.caller.metrics):
+                        return self.run_node(producer, node, prepared["data"], inputs=prepared["inputs"][node])
+                return LCRunnableLambda(run, name=node)
+
+            return LCRunnableLambda(prepare) | RunnableParallel({node: invoke(node) for node in group})
+
+        if "sequence" in chain:
+            links = chain["sequence"]
+            fused = chain.get("fused", False)
+            return RunnableSequence(*[step(links[i - 1] if i else "input", link, fused) for i, link in enumerate(links)])
+        if "parallel" in chain:
+            return group_step("input", chain["parallel"])
+
+        nodes, edges = chain["dag"]["nodes"], chain["dag"]["edges"]
+        upstream     = {node: [a for a, b in edges if b == node] for node in nodes}
+        order        = topological_order(nodes, edges)
+        depth: Dict[str, int] = {}
+        for node in order:
+            depth[node] = max((depth[name] + 1 for name in upstream[node]), default=0)
+
+        def gather(node: str) -> "Runnable":
+            def merge(state: Dict[str, Any]) -> Any:
+                if not upstream[node]:
+                    return state["input"]
+                merged: Dict[str, Any] = {}
+                for name in upstream[node]:
+                    if isinstance(state[name], dict):
+                        merged.update(state[name])
+                    else:
+                        merged[name] = state[name]
+                return merged
+            return LCRunnableLambda(merge)
+
+        def level_step(level: int) -> "Runnable":
+            groups: Dict[str, List[str]] = {}
+            for node in order:
+                if depth[node] == level:
+                    groups.setdefault("+".join(upstream[node]) or "input", []).append(node)
+
+            def flatten(state: Dict[str, Any]) -> Dict[str, Any]:
+                flat = {key: value for key, value in state.items() if not key.startswith("group:")}
+                for producer in groups:
+                    flat.update(state[f"group:{producer}"])
+                return flat
+
+            return RunnablePassthrough.assign(**{
+                f"group:{producer}": gather(group[0]) | group_step(producer, group) for producer, group in groups.items()
+            }) | LCRunnableLambda(flatten)
+
+        return RunnableSequence(
+            LCRunnableLambda(lambda kwargs: {"input": kwargs}),
+            *[level_step(level) for level in range(max(depth.values()) + 1)],
+            LCRunnableLambda(lambda state: {node: state[node] for node in nodes}),
+        )
 
     def get_definition(self, func_name: str) -> Dict[str, Any]:
         if func_name not in self.function_mapping:
@@ -423,27 +1082,35 @@ class RunnableChain:
 
 API_KEY = " "
 
-# Step 1: Import necessary modules and libraries
 
+def load_chain(streaming: bool = False, backend: Optional[str] = None):
+    from metaloom.base.backends import load_llm
+
+    return load_llm(backend, temperature=0.5, streaming=streaming)
 
-from dotenv import load_dotenv
-from langchain_google_vertexai import VertexAI
 
-load_dotenv()
+def get_llm(streaming: bool = False, backend: Optional[str] = None):
+    """
+    The shared model client, created on first use. The backend defaults to the
+    `METALOOM_BACKEND` environment variable, then "vertexai".
+    """
+    from metaloom.base.backends import get_client
 
+    return get_client(backend, temperature=0.5, streaming=streaming)
 
-def load_chain():
-    project_name = "okguis"
-    return VertexAI(
-        model_name       = "gemini-pro",
-        max_output_tokens= 8000,
-        temperature      = 0.5,
-        project          = project_name,
-        streaming        = False,
-    )
+
+@lru_cache(maxsize=None)
+def _output_model():
+    return create("Output", inspect.formatargvalues)
 
 
-llm  = load_chain()
+def __getattr__(name: str) -> Any:
+    # `llm` and `Output` used to be built at import time; they are now built on first access.
+    if name == "llm":
+        return get_llm()
+    if name == "Output":
+        return _output_model()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 
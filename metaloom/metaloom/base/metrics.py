@@ -0,0 +1,103 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, Optional
+
+_ACTIVE: ContextVar[Optional[Dict[str, Any]]] = ContextVar("metaloom_step_metrics", default=None)
+_PHASE: ContextVar[Optional[str]] = ContextVar("metaloom_step_phase", default=None)
+
+
+class MetricsHook:
+    """
+    Receives metrics for model calls and chain steps. The base class does nothing;
+    subclass it to publish to a metrics or tracing backend.
+
+    Methods:
+        on_call: Called after every model call with its record.
+        on_step: Called after every chain step, or standalone `RunnableFunction.invoke`, with its metrics.
+    """
+
+    def on_call(self, record: Dict[str, Any]) -> None:
+        pass
+
+    def on_step(self, metrics: Dict[str, Any]) -> None:
+        pass
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Rough token count (about four characters per token) that needs no tokenizer or network call.
+    """
+    return (len(text) + 3) // 4
+
+
+def new_metrics(name: str) -> Dict[str, Any]:
+    return {
+        "name"             : name,
+        "total"            : 0.0,
+        "transform"        : 0.0,
+        "llm"              : 0.0,
+        "parse"            : 0.0,
+        "llm_calls"        : 0,
+        "prompt_tokens"    : 0,
+        "completion_tokens": 0,
+        "retries"          : 0,
+        "hedges"           : 0,
+        "cache_hits"       : 0,
+        "coalesced"        : 0,
+        "saved_calls"      : 0,
+    }
+
+
+def current() -> Optional[Dict[str, Any]]:
+    return _ACTIVE.get()
+
+
+def add(**counts: Any) -> None:
+    """
+    Increment counters on the step being collected, if any.
+    """
+    metrics = _ACTIVE.get()
+    if metrics is not None:
+        for key, value in counts.items():
+            metrics[key] = metrics.get(key, 0) + value
+
+
+@contextmanager
+def collect(name: str, hook: Optional[MetricsHook] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Collect metrics for a step. Nested collections share the outermost step's metrics,
+    which are published to `hook` when it ends.
+    """
+    active = _ACTIVE.get()
+    if active is not None:
+        yield active
+        return
+    metrics = new_metrics(name)
+    token = _ACTIVE.set(metrics)
+    started = time.perf_counter()
+    try:
+        yield metrics
+    finally:
+        metrics["total"] = time.perf_counter() - started
+        _ACTIVE.reset(token)
+        if hook is not None:
+            hook.on_step(metrics)
+
+
+@contextmanager
+def phase(name: str) -> Iterator[None]:
+    """
+    Time a phase of the current step. Phases do not nest: time spent inside an outer
+    phase (such as the model call made by a transform) is counted to the outer one.
+    """
+    if _PHASE.get() is not None or _ACTIVE.get() is None:
+        yield
+        return
+    token = _PHASE.set(name)
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        add(**{name: time.perf_counter() - started})
+        _PHASE.reset(token)
@@ -1,36 +1,30 @@
+import asyncio
 import enum
-import json
-import re
+import time
 from enum import Enum
-from typing import Any, List, Sequence
+from typing import Any, Iterable, Iterator, List
 from pydantic import create_model
 from typing import Callable
+from functools import lru_cache
 import inspect
 
-from dotenv import load_dotenv
-from langchain_google_vertexai import VertexAI
 from langchain.output_parsers import EnumOutputParser, ResponseSchema, StructuredOutputParser
 from langchain.output_parsers.json import SimpleJsonOutputParser
-from langchain_core.prompts import ChatPromptTemplate, PromptTemplate
-from langchain_core.runnables import RunnableSequence, chain
-from langchain_core.prompts.chat import MessageLike
-from langchain_core.tools import tool
+from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.runnables import RunnableSequence
 from langchain.schema import AIMessage, HumanMessage, SystemMessage
-from langchain.pydantic_v1 import BaseModel
 
+from metaloom.base import executors
+from metaloom.base.calls import LLMCaller
+from metaloom.base.main import timings
+from metaloom.base.render import MessageRenderer
 
-# Load chat model
-def gemini(stream=False, memory=None) -> VertexAI:
-    # Initialize Vertex AI
-    load_dotenv()
-    project_name = "okguis"
-    return VertexAI(
-        model_name="gemini-pro",
-        max_output_tokens=8000,
-        temperature=0.2,
-        project=project_name,
-        streaming=stream,
-    )
+
+# Load chat model; clients are pooled per config, so repeat calls reuse the same one
+def gemini(stream=False, memory=None, backend=None):
+    from metaloom.base.backends import get_client
+
+    return get_client(backend, temperature=0.2, streaming=stream)
 
 
 from types import MappingProxyType
@@ -45,7 +39,16 @@ def create(name: str, func: Callable) -> Any:
     return model
 
 
-Output: BaseModel = create("Output", inspect.formatargvalues)
+@lru_cache(maxsize=None)
+def _output_model():
+    return create("Output", inspect.formatargvalues)
+
+
+def __getattr__(name: str) -> Any:
+    # `Output` used to be built at import time; it is now built on first access.
+    if name == "Output":
+        return _output_model()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 # priint the `Output` model
 # print(Output)
@@ -121,6 +124,9 @@ class MultiTemplate(ChatPromptTemplate):
     _my_callbacks  : dict = {} # future, to hold presets
     _my_parsers    : dict = {"structured": DynamicStructured, "enum": DynamicEnum}
     _my_logger     : Any  = None  # not implementd yet
+    _my_caller     : Any  = None  # LLMCaller, set with `set_caller`
+    _my_compiled   : dict = {}    # template name -> MessageRenderer of its messages, see `compile`
+    _my_missing    : Any  = "raise"  # missing-key policy for rendering, see `render`
     input_variables: List[str] = []
 
     def __init__(self, **kwargs):
@@ -132,6 +138,10 @@ class MultiTemplate(ChatPromptTemplate):
     def set_parser(self, parser):
         self.output_parser = self._my_parsers[parser]
 
+    @classmethod
+    def set_caller(cls, caller: LLMCaller):
+        cls._my_caller = caller
+
     def add_template(self, **kwargs):
         assert isinstance(kwargs, dict), f"Expected dict got {type(kwargs)}"
         name = kwargs["name"]
@@ -154,6 +164,7 @@ class MultiTemplate(ChatPromptTemplate):
         callbacks = kwargs.get("callbacks", {})
         assert isinstance(callbacks, dict
                             | list), f"Expected dict|list got {type(callbacks)}"
+        self._my_compiled.pop(name, None)
         self._my_prompts[name] = {
             "system": system,
             "rules": kwargs.get("rules", []),
@@ -165,6 +176,35 @@ class MultiTemplate(ChatPromptTemplate):
             "callbacks": callbacks,
         }
 
+    def add_selection(self, name, options: dict):
+        """
+        Register a named selection for templates that list it in `selections`.
+        """
+        self._my_selections[name] = options
+        self.invalidate(uses=("selections", name))
+
+    def add_meta_request(self, name, fields: dict):
+        """
+        Register a named meta request for templates that list it in `meta_requests`.
+        """
+        self._my_reqs[name] = fields
+        self.invalidate(uses=("meta_requests", name))
+
+    def invalidate(self, name=None, uses=None):
+        """
+        Drop compiled messages: for template `name`, for templates whose `uses[0]` list
+        names `uses[1]`, or for every template when neither is given.
+        """
+        if name is not None:
+            self._my_compiled.pop(name, None)
+        elif uses is not None:
+            field, entry = uses
+            for prompt_name, config in self._my_prompts.items():
+                if isinstance(config[field], list) and entry in config[field]:
+                    self._my_compiled.pop(prompt_name, None)
+        else:
+            self._my_compiled.clear()
+
     def get_info(self, name):
         return self._my_prompts[name]
 
@@ -230,24 +270,64 @@ class MultiTemplate(ChatPromptTemplate):
             messages.append(
                 AIMessage(
                     content=
-                    "I will ensure my response adheres to the instructions, and will not violate the rules, opting for rules in contested situations. {__dummy__}"
+                    "I will ensure my response adheres to the instructions, and will not violate the rules, opting for rules in contested situations."
                 ))
         messages.append(HumanMessage(content=prompt_config["template"]))
         self.messages = messages
         return messages
 
-    def buiild_prompt(self, prompt_name):
+    def renderer(self, name):
+        """
+        The compiled renderer of a template, built once and reused until the template, or a
+        registered selection or meta request it uses, changes. Registries edited directly
+        rather than through `add_selection`/`add_meta_request` need an `invalidate()`.
+        """
+        compiled = self._my_compiled.get(name)
+        if compiled is None:
+            compiled = self._my_compiled[name] = MessageRenderer(self.build_messages(name))
+        return compiled
+
+    def compile(self, name):
+        """
+        The message list of a template, from its compiled renderer.
+        """
+        messages = self.renderer(name).messages
+        self.messages = messages
+        return messages
+
+    def render(self, name, input, missing=None):
+        """
+        Fill a template's placeholders in one pass over its precompiled messages.
+
+        Args:
+            name: The template name.
+            input: Placeholder name -> value.
+            missing: Missing-key policy ("raise", "keep", "empty" or a function of the
+                name); defaults to `_my_missing`.
+
+        Returns:
+            The chat messages, ready for the model.
+        """
+        return self.renderer(name).render(input, missing or self._my_missing)
+
+    def select(self, prompt_name):
+        """
+        Point this template at a registered prompt, using its compiled messages.
+        """
         config = self._my_prompts[prompt_name]
         self.metadata = config.get("metadata", {})
         self.input_variables = config["input_variables"]
-        self.build_messages(prompt_name)
+        return self.compile(prompt_name)
+
+    def buiild_prompt(self, prompt_name):
+        config = self._my_prompts[prompt_name]
         kwargs = {
             'template':
             self,
             'input_variables':
             config["input_variables"],
             'messages':
-            self.build_messages(prompt_name)
+            self.select(prompt_name)
         }
         return MultiTemplate(**kwargs)
 
@@ -261,19 +341,78 @@ class MultiTemplate(ChatPromptTemplate):
         self._my_tools[name] = tool
         return self
 
-    def _myformat(self, input):
-        text = self.format_prompt(**input).to_string()
-        return re.sub(r"{(\w+)}", lambda match: input[match.group(1)], text)
+    def _myformat(self, input, name=None):
+        from langchain_core.messages import get_buffer_string
+
+        # The template name is passed in rather than kept on the instance: pydantic
+        # models reject attributes that are not fields.
+        if name is not None:
+            messages = self.render(name, input)
+        else:
+            messages = MessageRenderer(self.messages).render(input, self._my_missing)
+        return get_buffer_string(messages)
 
     # print(MULTIPLATE.get_info("greeting"))
+    def prepare(self, name):
+        """
+        Build the cue pipeline of a template once: its compiled renderer, the model client
+        and the caller.
+
+        Returns:
+            A `RunnableSequence` from template values to the parsed model output.
+        """
+        self.select(name)
+        renderer = self.renderer(name)
+        missing  = self._my_missing
+        llm      = gemini()
+        caller   = self._my_caller or LLMCaller()
+        parser   = SimpleJsonOutputParser()
+        return RunnableSequence(
+            lambda values: renderer.render(values, missing),
+            lambda messages: caller(llm, messages, step=name, parse=parser.parse),
+        )
+
     def cue(self, name, input_dict=None):
+        """
+        Run a template once.
+
+        Returns:
+            The parsed model output.
+        """
         if input_dict is None:
             input_dict = {}
-        prompt            = self.buiild_prompt(name)
-        llm               = gemini()
-        runnable_sequence = RunnableSequence(self._myformat, llm, SimpleJsonOutputParser())
-        output            = runnable_sequence.invoke(input_dict)
-        print(output)
-
-
-
+        return self.prepare(name).invoke(input_dict)
+
+    async def acue(self, name, input_dict=None):
+        """
+        `cue` without blocking the event loop; the call runs in a worker thread.
+        """
+        return await asyncio.to_thread(self.cue, name, input_dict)
+
+    def iter_cue(self, name, inputs: Iterable[dict], max_concurrency: int = 8) -> Iterator[dict]:
+        """
+        Run a template over many inputs, with up to `max_concurrency` model calls in flight.
+        The prompt is prepared once. Results are yielded in input order as they are ready.
+
+        Yields:
+            `{"index", "input", "output", "error", "timings"}` per input; a failed input has
+            `output` None and its exception in `error`, and does not stop the others.
+        """
+        runnable = self.prepare(name)
+
+        def run(index, values):
+            started = time.time()
+            try:
+                output, error = runnable.invoke(values), None
+            except Exception as e:
+                output, error = None, e
+            return {"index": index, "input": values, "output": output, "error": error, "timings": timings(started)}
+
+        items = ({"index": index, "values": values} for index, values in enumerate(inputs))
+        yield from executors.iter_map(run, items, "thread", max_concurrency)
+
+    def cue_many(self, name, inputs: Iterable[dict], max_concurrency: int = 8) -> List[dict]:
+        """
+        `iter_cue` collected into a list, in input order.
+        """
+        return list(self.iter_cue(name, inputs, max_concurrency))
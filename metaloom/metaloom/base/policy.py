@@ -0,0 +1,164 @@
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Optional, TypeVar
+
+from metaloom.base import metrics
+
+T = TypeVar("T")
+
+RETRYABLE_ERROR_NAMES = {
+    "APIConnectionError",
+    "APITimeoutError",
+    "DeadlineExceeded",
+    "InternalServerError",
+    "RateLimitError",
+    "ResourceExhausted",
+    "ServiceUnavailable",
+    "TooManyRequests",
+}
+
+
+def is_retryable(error: BaseException) -> bool:
+    """
+    Timeouts, connection errors, and provider errors for rate limits or unavailable
+    services are worth retrying; anything else is raised straight away.
+    """
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+    return any(cls.__name__ in RETRYABLE_ERROR_NAMES for cls in type(error).__mro__)
+
+
+class CallPolicy:
+    """
+    Deadline, retry and hedging rules for a model call.
+
+    Attributes:
+        timeout: Seconds before an attempt is abandoned with `TimeoutError`, or None.
+        retries: Extra attempts made after a retryable error.
+        backoff: Base delay in seconds; attempt n waits a random time up to `backoff * 2**n`.
+        max_backoff: Upper bound on a single retry delay.
+        hedge_after: Seconds after which a duplicate request is sent if the first has not returned.
+        hedge_percentile: Hedge after this percentile (0-100) of observed latencies instead,
+            once `min_samples` calls have completed.
+        retryable: Predicate deciding whether an error is retried.
+        stats: Counts of calls, retries, timeouts, hedges sent and hedges that won.
+
+    Examples:
+        POLICY = CallPolicy(timeout=30, retries=3, hedge_percentile=95)
+        CHAIN  = RunnableChain(llm, caller=LLMCaller(policy=POLICY))
+    """
+
+    def __init__(
+        self,
+        timeout         : Optional[float] = None,
+        retries         : int             = 0,
+        backoff         : float           = 0.5,
+        max_backoff     : float           = 8.0,
+        hedge_after     : Optional[float] = None,
+        hedge_percentile: Optional[float] = None,
+        min_samples     : int             = 20,
+        retryable       : Callable[[BaseException], bool] = is_retryable,
+        max_workers     : int             = 32,
+    ) -> None:
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.hedge_after = hedge_after
+        self.hedge_percentile = hedge_percentile
+        self.min_samples = min_samples
+        self.retryable = retryable
+        self.max_workers = max_workers
+        self.latencies: deque = deque(maxlen=500)
+        self.stats = {"calls": 0, "retries": 0, "timeouts": 0, "hedges": 0, "hedge_wins": 0}
+        self._lock = threading.Lock()
+        self._pool: Optional[ThreadPoolExecutor] = None
+
+    def _count(self, stat: str) -> None:
+        with self._lock:
+            self.stats[stat] += 1
+
+    def delay(self, attempt: int) -> float:
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+
+    def hedge_delay(self) -> Optional[float]:
+        if self.hedge_after is not None:
+            return self.hedge_after
+        if self.hedge_percentile is None:
+            return None
+        with self._lock:
+            samples = sorted(self.latencies)
+        if len(samples) < self.min_samples:
+            return None
+        index = min(len(samples) - 1, int(len(samples) * self.hedge_percentile / 100))
+        return samples[index]
+
+    def run(self, fn: Callable[[], T]) -> T:
+        """
+        Call `fn` under this policy.
+
+        Returns:
+            The first successful result.
+
+        Raises:
+            TimeoutError: The last attempt exceeded `timeout`.
+            Exception: The last error raised by `fn`, or the first non-retryable one.
+        """
+        self._count("calls")
+        attempt = 0
+        while True:
+            try:
+                return self._attempt(fn)
+            except Exception as e:
+                if attempt >= self.retries or not self.retryable(e):
+                    raise
+                self._count("retries")
+                metrics.add(retries=1)
+                time.sleep(self.delay(attempt))
+                attempt += 1
+
+    def _record(self, started: float) -> None:
+        with self._lock:
+            self.latencies.append(time.monotonic() - started)
+
+    def _attempt(self, fn: Callable[[], T]) -> T:
+        started = time.monotonic()
+        hedge = self.hedge_delay()
+        if self.timeout is None and hedge is None:
+            result = fn()
+            self._record(started)
+            return result
+
+        if self._pool is None:
+            with self._lock:
+                if self._pool is None:
+                    self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="metaloom-call")
+        deadline = started + self.timeout if self.timeout is not None else None
+        primary = self._pool.submit(fn)
+        futures = [primary]
+        if hedge is not None and (self.timeout is None or hedge < self.timeout):
+            done, _ = wait(futures, timeout=hedge)
+            if not done:
+                futures.append(self._pool.submit(fn))
+                self._count("hedges")
+                metrics.add(hedges=1)
+
+        error: Optional[BaseException] = None
+        while futures:
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            done, _ = wait(futures, timeout=remaining, return_when=FIRST_COMPLETED)
+            if not done:
+                self._count("timeouts")
+                raise TimeoutError(f"Model call exceeded its {self.timeout}s deadline")
+            for future in done:
+                futures.remove(future)
+                if future.exception() is None:
+                    if future is not primary:
+                        self._count("hedge_wins")
+                    self._record(started)
+                    return future.result()
+                error = future.exception()
+        raise error
@@ -0,0 +1,75 @@
+import hashlib
+import json
+import threading
+import time
+from typing import Any, Dict, Iterator, List
+
+from metaloom.base.calls import model_identity, prompt_text
+
+
+def prompt_key(prompt: Any) -> str:
+    """
+    Hash of a prompt's rendered text, which recordings are matched on when replayed.
+    """
+    return hashlib.sha256(prompt_text(prompt).encode("utf-8")).hexdigest()
+
+
+class Recorder:
+    """
+    Appends every model request and response that goes through an `LLMCaller` to a JSON
+    lines file, for `ReplayLLM` to serve back offline.
+
+    Each line holds the step, model name and parameters, prompt text and key, response text,
+    the call's latency in seconds and when it was made.
+
+    Examples:
+        CALLER = LLMCaller(recorder=Recorder("calls.jsonl"))
+        MultiTemplate.set_caller(CALLER)
+        CHAIN  = RunnableChain(llm, caller=CALLER)
+    """
+
+    def __init__(self, path) -> None:
+        self.path = path
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def record(self, llm, prompt: Any, text: str, latency: float, step: str = "") -> None:
+        name, params = model_identity(llm)
+        entry = {
+            "step"    : step,
+            "model"   : name,
+            "params"  : params,
+            "key"     : prompt_key(prompt),
+            "prompt"  : prompt_text(prompt),
+            "response": text,
+            "latency" : latency,
+            "created" : time.time(),
+        }
+        line = json.dumps(entry, default=str)
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+            self.count += 1
+
+
+def load_recording(path) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Read a recording.
+
+    Returns:
+        Prompt key -> the entries recorded for it, in call order.
+    """
+    entries: Dict[str, List[Dict[str, Any]]] = {}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                entry = json.loads(line)
+                entries.setdefault(entry["key"], []).append(entry)
+    return entries
+
+
+def iter_recording(path) -> Iterator[Dict[str, Any]]:
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
@@ -0,0 +1,87 @@
+import re
+from typing import Any, Callable, Dict, List, Sequence, Tuple, Union
+
+PLACEHOLDER = re.compile(r"{(\w+)}")
+
+MISSING_POLICIES = ("raise", "keep", "empty")
+
+Missing = Union[str, Callable[[str], str]]
+
+
+class CompiledTemplate:
+    """
+    A template split once into static text and `{name}` placeholders, rendered in a
+    single pass. Braces around anything but a plain name (JSON examples, for instance)
+    are static text.
+
+    Attributes:
+        segments: (static text, placeholder name or None) pairs.
+        variables: The placeholder names, in order of first use.
+    """
+
+    def __init__(self, text: str) -> None:
+        self.text = text
+        self.segments: List[Tuple[str, Union[str, None]]] = []
+        position = 0
+        for match in PLACEHOLDER.finditer(text):
+            self.segments.append((text[position:match.start()], match.group(1)))
+            position = match.end()
+        self.segments.append((text[position:], None))
+        self.variables = list(dict.fromkeys(name for _, name in self.segments if name is not None))
+
+    def render(self, values: Dict[str, Any], missing: Missing = "raise") -> str:
+        """
+        Fill the placeholders.
+
+        Args:
+            values: Placeholder name -> value; values are converted with `str`.
+            missing: What to do for a placeholder without a value: "raise" a `KeyError`,
+                "keep" the placeholder, put in "empty" text, or call a function with the name.
+
+        Returns:
+            The rendered text.
+        """
+        if not self.variables:
+            return self.text
+        parts = []
+        for static, name in self.segments:
+            parts.append(static)
+            if name is None:
+                continue
+            if name in values:
+                parts.append(str(values[name]))
+            elif callable(missing):
+                parts.append(missing(name))
+            elif missing == "keep":
+                parts.append("{" + name + "}")
+            elif missing == "empty":
+                continue
+            else:
+                raise KeyError(f"Template has no value for '{name}'")
+        return "".join(parts)
+
+
+class MessageRenderer:
+    """
+    Renders a list of chat messages whose contents hold `{name}` placeholders, tokenizing
+    every message once. Rendering returns new messages of the same types.
+
+    Examples:
+        RENDERER = MessageRenderer([SystemMessage(content="You write {style}."), HumanMessage(content="{request}")])
+        RENDERER.render({"style": "haiku", "request": "Autumn"})
+    """
+
+    def __init__(self, messages: Sequence[Any]) -> None:
+        self.messages = list(messages)
+        self.templates = [CompiledTemplate(message.content) for message in self.messages]
+        self.variables = list(dict.fromkeys(name for template in self.templates for name in template.variables))
+
+    def render(self, values: Dict[str, Any], missing: Missing = "raise") -> List[Any]:
+        if not callable(missing) and missing not in MISSING_POLICIES:
+            raise ValueError(f"Missing-key policy '{missing}' does not exist, choose one of {list(MISSING_POLICIES)}")
+        rendered = []
+        for message, template in zip(self.messages, self.templates):
+            if template.variables:
+                message = type(message)(content=template.render(values, missing))
+            rendered.append(message)
+        return rendered
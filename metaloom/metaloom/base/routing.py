@@ -0,0 +1,125 @@
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple, TypeVar
+
+from metaloom.base.calls import model_identity
+
+T = TypeVar("T")
+
+LOGGER = logging.getLogger("metaloom")
+
+PHASES = ("invoke", "transform")
+
+
+class ModelRouter:
+    """
+    Picks the model for each call by phase and function, escalating to the chain's own
+    model when a routed call fails or its answer does not validate.
+
+    Routes are looked up from most to least specific: "phase:function", then "phase".
+    Calls with no route go straight to the default model.
+
+    Attributes:
+        models: Model name -> LLM object.
+        routes: Route -> model name.
+        fallback: Model name to escalate to, or None for the default model passed to `call`.
+        stats: Per "phase:model", the number of calls, successes, failures and total seconds.
+
+    Examples:
+        ROUTER = ModelRouter({"flash": load_llm(model_name="gemini-flash")}, {"transform": "flash"})
+        CHAIN  = RunnableChain(load_llm(model_name="gemini-pro"), router=ROUTER)
+    """
+
+    def __init__(
+        self,
+        models  : Dict[str, Any],
+        routes  : Optional[Dict[str, str]] = None,
+        fallback: Optional[str]            = None,
+    ) -> None:
+        self.models = dict(models)
+        self.routes: Dict[str, str] = {}
+        self.fallback = fallback
+        self.stats: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        for route, model in (routes or {}).items():
+            phase, _, function = route.partition(":")
+            self.add_route(phase, model, function or None)
+
+    def add_route(self, phase: str, model: str, function: Optional[str] = None) -> None:
+        """
+        Send `phase` calls (for `function` only, if given) to `model`.
+        """
+        if phase not in PHASES:
+            raise ValueError(f"Phase '{phase}' does not exist, choose one of {list(PHASES)}")
+        if model not in self.models:
+            raise KeyError(f"Model '{model}' does not exist")
+        self.routes[f"{phase}:{function}" if function else phase] = model
+
+    def select(self, phase: str, function: str) -> Optional[str]:
+        return self.routes.get(f"{phase}:{function}", self.routes.get(phase))
+
+    def candidates(self, phase: str, function: str, default: Any) -> List[Tuple[str, Any]]:
+        """
+        The models to try in order, as (name, LLM) pairs: the routed model, then the one
+        escalated to.
+        """
+        chosen = []
+        routed = self.select(phase, function)
+        if routed is not None:
+            chosen.append((routed, self.models[routed]))
+        if self.fallback is not None:
+            chosen.append((self.fallback, self.models[self.fallback]))
+        else:
+            chosen.append((model_identity(default)[0], default))
+        unique: List[Tuple[str, Any]] = []
+        for name, llm in chosen:
+            if all(llm is not other for _, other in unique):
+                unique.append((name, llm))
+        return unique
+
+    def _record(self, route: str, ok: bool, elapsed: float) -> None:
+        with self._lock:
+            stats = self.stats.setdefault(route, {"calls": 0, "successes": 0, "failures": 0, "latency": 0.0})
+            stats["calls"] += 1
+            stats["successes" if ok else "failures"] += 1
+            stats["latency"] += elapsed
+
+    def success_rate(self, route: str) -> Optional[float]:
+        stats = self.stats.get(route)
+        return stats["successes"] / stats["calls"] if stats else None
+
+    def mean_latency(self, route: str) -> Optional[float]:
+        stats = self.stats.get(route)
+        return stats["latency"] / stats["calls"] if stats else None
+
+    def call(self, phase: str, function: str, attempt: Callable[[Any], T], default: Any) -> T:
+        """
+        Run `attempt(llm)` on each candidate model until one returns without raising.
+
+        Args:
+            phase: "invoke" or "transform".
+            function: The function the call is for.
+            attempt: Makes the call and validates its answer, raising if it is unusable.
+            default: The model used when there is no route and no `fallback`.
+
+        Returns:
+            The first successful result.
+
+        Raises:
+            Exception: The error of the last candidate.
+        """
+        candidates = self.candidates(phase, function, default)
+        for i, (name, llm) in enumerate(candidates):
+            started = time.perf_counter()
+            try:
+                result = attempt(llm)
+            except Exception as e:
+                self._record(f"{phase}:{name}", False, time.perf_counter() - started)
+                if i == len(candidates) - 1:
+                    raise
+                LOGGER.debug("%s %s on %s failed, escalating: %s", phase, function, name, e)
+                continue
+            self._record(f"{phase}:{name}", True, time.perf_counter() - started)
+            return result
+        raise RuntimeError("No model to call")
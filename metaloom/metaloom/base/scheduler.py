@@ -0,0 +1,173 @@
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Deque, Dict, Iterator, Optional, TypeVar
+
+T = TypeVar("T")
+
+INTERACTIVE = "interactive"
+BATCH = "batch"
+
+_PRIORITY: ContextVar[Optional[str]] = ContextVar("metaloom_call_priority", default=None)
+
+
+@contextmanager
+def priority(name: str) -> Iterator[None]:
+    """
+    Send the model calls made inside this block with the given priority class.
+
+    Examples:
+        with priority(BATCH):
+            CHAIN.call_chain("nightly_report", topic="sales")
+    """
+    token = _PRIORITY.set(name)
+    try:
+        yield
+    finally:
+        _PRIORITY.reset(token)
+
+
+def current_priority() -> Optional[str]:
+    return _PRIORITY.get()
+
+
+class TokenBucket:
+    """
+    Refills at `per_minute` units a minute, holding at most `capacity` (one minute's worth by default).
+    The level may go negative when usage is charged after the fact.
+    """
+
+    def __init__(self, per_minute: float, capacity: Optional[float] = None) -> None:
+        self.rate = per_minute / 60.0
+        self.capacity = capacity if capacity is not None else per_minute
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def refill(self) -> None:
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """
+        Seconds until `amount` units are available (0 if they are now).
+        """
+        self.refill()
+        amount = min(amount, self.capacity)
+        if self.level >= amount:
+            return 0.0
+        return (amount - self.level) / self.rate
+
+    def take(self, amount: float) -> None:
+        self.refill()
+        self.level -= amount
+
+
+class CallScheduler:
+    """
+    Process-wide gate in front of the model: token-bucket limits on requests and tokens per
+    minute, and weighted fair sharing between priority classes when calls have to wait.
+
+    Share one scheduler between every `LLMCaller` in the process, so runners, transforms and
+    `MultiTemplate.cue` draw on the same quota. Calls take the priority set with `priority()`,
+    or `default_priority`.
+
+    Attributes:
+        requests: Request bucket, or None for no request limit.
+        tokens: Token bucket, or None for no token limit. Prompt tokens are taken before the
+            call; completion tokens are charged once it returns.
+        weights: Share of dispatches each priority class gets while several are waiting.
+        stats: Per class, the number of calls, calls that had to wait and total seconds waited.
+
+    Examples:
+        SCHEDULER = CallScheduler(requests_per_minute=300, tokens_per_minute=120_000)
+        CHAIN     = RunnableChain(llm, caller=LLMCaller(scheduler=SCHEDULER))
+        MultiTemplate.set_caller(LLMCaller(scheduler=SCHEDULER))
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: Optional[float]            = None,
+        tokens_per_minute  : Optional[float]            = None,
+        weights            : Optional[Dict[str, float]] = None,
+        default_priority   : str                        = INTERACTIVE,
+    ) -> None:
+        self.requests = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self.weights = weights or {INTERACTIVE: 3.0, BATCH: 1.0}
+        self.default_priority = default_priority
+        self.stats: Dict[str, Dict[str, Any]] = {}
+        self._queues: Dict[str, Deque[object]] = {}
+        self._vtime: Dict[str, float] = {}
+        self._vclock = 0.0
+        self._cond = threading.Condition()
+
+    def _next_class(self) -> Optional[str]:
+        waiting = [name for name, queue in self._queues.items() if queue]
+        if not waiting:
+            return None
+        return min(waiting, key=lambda name: self._vtime[name])
+
+    def _wait_time(self, tokens: float) -> float:
+        wait = 0.0
+        if self.requests is not None:
+            wait = max(wait, self.requests.wait_time(1))
+        if self.tokens is not None:
+            wait = max(wait, self.tokens.wait_time(tokens))
+        return wait
+
+    def acquire(self, priority: Optional[str] = None, tokens: float = 0) -> float:
+        """
+        Block until a call of this priority class may go out, and take its share of the buckets.
+
+        Returns:
+            The seconds spent waiting.
+        """
+        name = priority or current_priority() or self.default_priority
+        ticket = object()
+        started = time.monotonic()
+        with self._cond:
+            queue = self._queues.setdefault(name, deque())
+            if not queue:
+                self._vtime[name] = max(self._vtime.get(name, 0.0), self._vclock)
+            queue.append(ticket)
+            stats = self.stats.setdefault(name, {"calls": 0, "waited": 0, "wait_time": 0.0})
+            while True:
+                if self._next_class() == name and queue[0] is ticket:
+                    wait = self._wait_time(tokens)
+                    if wait <= 0:
+                        break
+                    self._cond.wait(wait)
+                else:
+                    self._cond.wait()
+            queue.popleft()
+            if self.requests is not None:
+                self.requests.take(1)
+            if self.tokens is not None:
+                self.tokens.take(tokens)
+            self._vclock = self._vtime[name]
+            self._vtime[name] += 1.0 / self.weights.get(name, 1.0)
+            waited = time.monotonic() - started
+            stats["calls"] += 1
+            stats["waited"] += int(waited > 0.001)
+            stats["wait_time"] += waited
+            self._cond.notify_all()
+        return waited
+
+    def charge(self, tokens: float) -> None:
+        """
+        Take tokens used after the fact, such as a call's completion tokens.
+        """
+        if self.tokens is None or not tokens:
+            return
+        with self._cond:
+            self.tokens.take(tokens)
+
+    def run(self, fn: Callable[[], T], priority: Optional[str] = None, tokens: float = 0) -> T:
+        """
+        Call `fn` once the scheduler lets a call of this priority class through.
+        """
+        self.acquire(priority, tokens)
+        return fn()
@@ -0,0 +1,68 @@
+import threading
+from typing import Any, Callable, Dict, Optional, Tuple, TypeVar
+
+T = TypeVar("T")
+
+
+class _Flight:
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Coalesces identical in-flight calls: while a call for a key is running, further calls
+    for the same key wait for it and share its result (or its error) instead of running again.
+
+    Attributes:
+        stats: Counts of calls that ran ("leaders") and calls that waited on one ("coalesced").
+
+    Examples:
+        CALLER = LLMCaller(singleflight=SingleFlight())
+        CHAIN  = RunnableChain(llm, caller=CALLER)
+    """
+
+    def __init__(self) -> None:
+        self.stats = {"leaders": 0, "coalesced": 0}
+        self._flights: Dict[str, _Flight] = {}
+        self._lock = threading.Lock()
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._flights)
+
+    def do(self, key: str, fn: Callable[[], T]) -> Tuple[T, bool]:
+        """
+        Call `fn`, unless a call for `key` is already running.
+
+        Returns:
+            The result, and whether it was shared from another caller's call.
+        """
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+                self.stats["leaders"] += 1
+            else:
+                flight.waiters += 1
+                self.stats["coalesced"] += 1
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result, True
+
+        try:
+            flight.result = fn()
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+        return flight.result, False
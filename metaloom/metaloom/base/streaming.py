@@ -0,0 +1,129 @@
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+from metaloom.base.decoding import loads, repair
+
+
+class IncrementalJSONParser:
+    """
+    Parses a JSON object as it streams in, emitting each top-level field once its value is complete.
+
+    Text before the opening `{` (such as a markdown fence) is skipped. Nested values are
+    emitted whole once their closing bracket arrives. Values with the usual model mistakes
+    (single quotes, Python literals, trailing commas) are repaired; a value that cannot be
+    repaired is not emitted and is left to the parse of the whole response.
+
+    A top-level array is not an object with fields: the parser stops at its `[` and emits
+    nothing.
+
+    Attributes:
+        buffer: All text fed so far.
+        fields: The completed top-level fields.
+        done: True once no more fields can arrive: the top-level object has been closed,
+            or the output is an array.
+
+    Examples:
+        parser = IncrementalJSONParser()
+        parser.feed('{"title": "Ca')      # []
+        parser.partial()                  # ('title', 'Ca')
+        parser.feed('ts", "count": 3}')   # [('title', 'Cats'), ('count', 3)]
+    """
+
+    def __init__(self) -> None:
+        self.buffer = ""
+        self.fields: Dict[str, Any] = {}
+        self.done = False
+        self._pos = 0
+        self._depth = 0
+        self._quote: Optional[str] = None
+        self._escape = False
+        self._key: Optional[str] = None
+        self._key_start: Optional[int] = None
+        self._value_start: Optional[int] = None
+
+    def feed(self, chunk: str) -> List[Tuple[str, Any]]:
+        """
+        Add streamed text.
+
+        Args:
+            chunk: The next piece of model output.
+
+        Returns:
+            The (key, value) pairs completed by this chunk.
+        """
+        self.buffer += chunk
+        completed: List[Tuple[str, Any]] = []
+        while self._pos < len(self.buffer) and not self.done:
+            char = self.buffer[self._pos]
+            if self._depth == 0:
+                if char == "{":
+                    self._depth = 1
+                elif char == "[":
+                    self.done = True
+            elif self._quote is not None:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == self._quote:
+                    self._quote = None
+                    if self._depth == 1 and self._value_start is None:
+                        try:
+                            self._key = self._decode(self.buffer[self._key_start:self._pos + 1])
+                        except (ValueError, IndexError):
+                            self._key = None
+            elif char in "\"'":
+                self._quote = char
+                if self._depth == 1 and self._value_start is None:
+                    self._key_start = self._pos
+            elif char == ":" and self._depth == 1 and self._value_start is None:
+                self._value_start = self._pos + 1
+            elif char == "," and self._depth == 1:
+                self._complete(completed)
+            elif char in "{[":
+                self._depth += 1
+            elif char in "}]":
+                if self._depth == 1:
+                    self._complete(completed)
+                    self.done = True
+                self._depth -= 1
+            self._pos += 1
+        return completed
+
+    def _complete(self, completed: List[Tuple[str, Any]]) -> None:
+        if self._key is not None and self._value_start is not None:
+            raw = self.buffer[self._value_start:self._pos].strip()
+            if raw:
+                try:
+                    value = self._decode(raw)
+                except (ValueError, IndexError):
+                    pass
+                else:
+                    self.fields[self._key] = value
+                    completed.append((self._key, value))
+        self._key = self._key_start = self._value_start = None
+
+    @staticmethod
+    def _decode(raw: str) -> Any:
+        try:
+            return loads(raw)
+        except json.JSONDecodeError:
+            # Wrapped in a list so that repair also handles bare strings and literals.
+            return loads(repair(f"[{raw}]"))[0]
+
+    def partial(self) -> Optional[Tuple[str, str]]:
+        """
+        The top-level field currently being streamed, with its value text so far.
+
+        Returns:
+            (key, text so far), or None between fields. String values are unquoted.
+        """
+        if self._key is None or self._value_start is None or self.done:
+            return None
+        raw = self.buffer[self._value_start:].strip()
+        if raw[:1] in ("\"", "'") and self._depth == 1:
+            try:
+                return self._key, self._decode(raw + (raw[0] if self._quote and not self._escape else ""))
+            except (ValueError, IndexError):
+                return self._key, raw[1:]
+        return self._key, raw
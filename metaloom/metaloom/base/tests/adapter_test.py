@@ -0,0 +1,89 @@
+import inspect
+
+import pytest
+
+from metaloom.base.adapter import SchemaAdapter
+
+
+def consumer(topic: str, count: int):
+    return {"text": topic * count}
+
+
+SIGNATURE = inspect.signature(consumer)
+
+
+def test_matches_exact_alias_and_normalized_names():
+    adapter = SchemaAdapter(aliases={"count": ["n"]})
+    assert adapter.match({"topic": "a", "n": 2}, ["topic", "count"]) == {"topic": "topic", "count": "n"}
+    assert adapter.match({"Topic": "a", "COUNT": 2}, ["topic", "count"]) == {"topic": "Topic", "count": "COUNT"}
+    assert adapter.match({"topic": "a"}, ["topic", "count"]) is None
+
+
+def test_coerces_values_to_annotations():
+    adapter = SchemaAdapter()
+    assert adapter.adapt("a", "b", {"topic": "x", "count": "3"}, ["topic", "count"], SIGNATURE) == {"topic": "x", "count": 3}
+    assert adapter.stats == {"direct": 1, "fallback": 0}
+
+
+def test_falls_back_when_a_value_does_not_coerce():
+    adapter = SchemaAdapter()
+    assert adapter.adapt("a", "b", {"topic": "x", "count": "many"}, ["topic", "count"], SIGNATURE) is None
+    assert adapter.adapt("a", "b", "not a dict", ["topic", "count"], SIGNATURE) is None
+    assert adapter.stats == {"direct": 0, "fallback": 2}
+    assert ("a", "b") not in adapter.mappings
+
+
+def test_reuses_the_mapping_of_a_pair():
+    adapter = SchemaAdapter(aliases={"count": ["n"]})
+    adapter.adapt("a", "b", {"topic": "x", "n": 1}, ["topic", "count"], SIGNATURE)
+    assert adapter.mappings[("a", "b")] == {"topic": "topic", "count": "n"}
+    adapter.aliases.clear()
+    assert adapter.adapt("a", "b", {"topic": "y", "n": 2}, ["topic", "count"], SIGNATURE) == {"topic": "y", "count": 2}
+    assert adapter.adapt("a", "c", {"topic": "y", "n": 2}, ["topic", "count"], SIGNATURE) is None
+
+
+def test_learns_mappings_that_copy_values():
+    adapter = SchemaAdapter()
+    adapter.learn("a", "b", {"title": "x", "size": 2}, {"topic": "x", "count": 2})
+    assert adapter.mappings[("a", "b")] == {"topic": "title", "count": "size"}
+    assert adapter.adapt("a", "b", {"title": "y", "size": 3}, ["topic", "count"], SIGNATURE) == {"topic": "y", "count": 3}
+
+
+def test_does_not_learn_ambiguous_or_new_values():
+    adapter = SchemaAdapter()
+    adapter.learn("a", "b", {"title": "x", "subtitle": "x"}, {"topic": "x"})
+    adapter.learn("a", "c", {"title": "x"}, {"topic": "a rewritten x"})
+    assert adapter.mappings == {}
+
+
+def test_chain_skips_the_transform_call_when_keys_line_up():
+    pytest.importorskip("langchain_core")
+    from metaloom.base.backends import FakeLLM
+    from metaloom.base.main import RunnableChain
+
+    def outline(topic: str):
+        return {"Topic": topic, "Count": "2"}
+
+    def draft(topic: str, count: int):
+        return {"draft": topic * count}
+
+    def review(subject: str):
+        return {"review": subject}
+
+    llm = FakeLLM()
+    chain = RunnableChain(llm)
+    chain.add_function("outline", outline, "Outline {topic}")
+    chain.add_function("draft", draft, "Draft {topic} {count} times")
+    chain.add_function("review", review, "Review {subject}")
+    llm.register_chain(chain)
+
+    chain.define_sequence_chain("direct", ["outline", "draft"])
+    bus = chain.call_chain("direct", topic="ab")
+    assert bus[-1][1]["output"] == {"draft": "abab"}
+    assert llm.calls == 2
+    assert chain.adapter.stats == {"direct": 2, "fallback": 0}
+
+    chain.define_sequence_chain("transformed", ["outline", "review"])
+    chain.call_chain("transformed", topic="ab")
+    assert llm.calls == 5
+    assert chain.adapter.stats == {"direct": 3, "fallback": 1}
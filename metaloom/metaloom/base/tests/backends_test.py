@@ -0,0 +1,78 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+pytest.importorskip("langchain_core")
+
+from metaloom.base import backends  # noqa: E402
+
+
+@pytest.fixture
+def builds(monkeypatch):
+    state = {"builds": 0, "running": 0, "overlap": 0, "release": threading.Event()}
+    lock = threading.Lock()
+
+    def load_llm(backend=None, **config):
+        with lock:
+            state["builds"] += 1
+            state["running"] += 1
+            state["overlap"] = max(state["overlap"], state["running"])
+        state["release"].wait(5)
+        with lock:
+            state["running"] -= 1
+        return object()
+
+    monkeypatch.setattr(backends, "load_llm", load_llm)
+    backends.clear_clients()
+    yield state
+    state["release"].set()
+    backends.clear_clients()
+
+
+def test_threads_share_one_client(builds):
+    builds["release"].set()
+    with ThreadPoolExecutor(8) as pool:
+        clients = list(pool.map(lambda _: backends.get_client("fake", temperature=0.2), range(8)))
+    assert builds["builds"] == 1
+    assert all(client is clients[0] for client in clients)
+    assert backends.get_client("fake", temperature=0.5) is not clients[0]
+
+
+def test_clear_during_a_build_does_not_start_a_second_one(builds):
+    with ThreadPoolExecutor(2) as pool:
+        first = pool.submit(backends.get_client, "fake")
+        deadline = time.monotonic() + 5
+        while builds["running"] == 0 and time.monotonic() < deadline:
+            time.sleep(0.001)
+        backends.clear_clients()
+        second = pool.submit(backends.get_client, "fake")
+        time.sleep(0.05)
+        builds["release"].set()
+        assert first.result(5) is second.result(5)
+    assert builds["overlap"] == 1
+
+
+def test_fake_llm_applies_latency_and_jitter():
+    llm = backends.FakeLLM(latency=0.05, jitter=0.05, seed=1)
+    started = time.perf_counter()
+    assert llm.invoke("anything") == "{}"
+    elapsed = time.perf_counter() - started
+    assert 0.05 <= elapsed < 0.5
+    assert llm.calls == 1
+
+
+def test_fake_llm_injects_errors():
+    with pytest.raises(ConnectionError):
+        backends.FakeLLM(error_rate=1.0).invoke("anything")
+    with pytest.raises(TimeoutError):
+        list(backends.FakeLLM(error_rate=1.0, error=TimeoutError).stream("anything"))
+    llm = backends.FakeLLM(error_rate=0.5, seed=3)
+    failures = 0
+    for _ in range(200):
+        try:
+            llm.invoke("anything")
+        except ConnectionError:
+            failures += 1
+    assert 60 < failures < 140
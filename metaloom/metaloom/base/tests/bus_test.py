@@ -0,0 +1,52 @@
+import gc
+import os
+
+import pytest
+
+from metaloom.base.bus import Bus, Retention, ValueStore, is_handle
+
+
+def records(count, size):
+    return [{i: {"name": f"s{i}", "inputs": {"doc": "x" * size}, "output": {"doc": "x" * size}}} for i in range(count)]
+
+
+def test_last_keeps_newest_records():
+    bus = Bus(Retention("last", last=2))
+    for step_info in records(5, 10):
+        bus.append(step_info)
+    assert [next(iter(step_info)) for step_info in bus.steps()] == [3, 4]
+
+
+def test_spill_stores_large_values_once(tmp_path):
+    store = ValueStore(str(tmp_path / "values.db"))
+    bus = Bus(Retention("spill", store=store, threshold=100))
+    for step_info in records(3, 1000):
+        bus.append(step_info)
+    output = bus.steps()[-1][2]["output"]
+    assert is_handle(output)
+    assert store.get(output) == {"doc": "x" * 1000}
+    assert len(store) == 1
+
+
+def test_outputs_drops_inputs():
+    bus = Bus(Retention("outputs"))
+    bus.append(records(1, 10)[0])
+    assert "inputs" not in bus.steps()[0][0]
+    with pytest.raises(ValueError):
+        Retention("last")
+
+
+def test_temporary_store_removes_its_file(tmp_path):
+    store = ValueStore()
+    path = store.db_path
+    store.put({"doc": "x"})
+    store.close()
+    assert not os.path.exists(path)
+    store = ValueStore()
+    path = store.db_path
+    del store
+    gc.collect()
+    assert not os.path.exists(path)
+    kept = ValueStore(str(tmp_path / "values.db"))
+    kept.close()
+    assert os.path.exists(tmp_path / "values.db")
@@ -0,0 +1,67 @@
+import json
+import time
+
+import pytest
+
+from metaloom.base.cache import ResponseCache
+from metaloom.base.calls import LLMCaller
+
+
+def test_hit_and_miss_stats(tmp_path):
+    cache = ResponseCache(tmp_path / "responses.db")
+    assert cache.get("a", step="write") is None
+    cache.set("a", '{"text": "hi"}', step="write")
+    assert cache.get("a", step="write") == '{"text": "hi"}'
+    assert cache.stats == {"write": {"hits": 1, "misses": 1}}
+
+
+def test_ttl_expires_entries(tmp_path):
+    cache = ResponseCache(tmp_path / "responses.db", ttl=0.01)
+    cache.set("a", "old")
+    time.sleep(0.05)
+    assert cache.get("a") is None
+    assert len(cache) == 0
+
+
+def test_lru_eviction(tmp_path):
+    cache = ResponseCache(tmp_path / "responses.db", max_entries=2)
+    cache.set("a", "1")
+    cache.set("b", "2")
+    assert cache.get("a") == "1"
+    cache.set("c", "3")
+    assert cache.get("b") is None
+    assert cache.get("a") == "1"
+    assert cache.get("c") == "3"
+    assert cache.evictions == 1
+
+
+def test_persists_across_instances(tmp_path):
+    ResponseCache(tmp_path / "responses.db").set("a", "1")
+    assert ResponseCache(tmp_path / "responses.db").get("a") == "1"
+
+
+class Answers:
+    def __init__(self, *answers):
+        self.answers = list(answers)
+
+    def invoke(self, prompt):
+        return self.answers.pop(0)
+
+
+def test_caller_caches_only_parsed_responses(tmp_path):
+    caller = LLMCaller(cache=ResponseCache(tmp_path / "responses.db"))
+    llm = Answers("not json", '{"a": 1}')
+    with pytest.raises(json.JSONDecodeError):
+        caller(llm, "prompt", parse=json.loads)
+    assert len(caller.cache) == 0
+    assert caller(llm, "prompt", parse=json.loads) == {"a": 1}
+    assert caller(llm, "prompt", parse=json.loads) == {"a": 1}
+    assert len(caller.cache) == 1
+
+
+def test_caller_drops_cached_responses_that_no_longer_parse(tmp_path):
+    caller = LLMCaller(cache=ResponseCache(tmp_path / "responses.db"))
+    caller(Answers("plain text"), "prompt")
+    with pytest.raises(json.JSONDecodeError):
+        caller(Answers(), "prompt", parse=json.loads)
+    assert len(caller.cache) == 0
@@ -0,0 +1,150 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("langchain_core")
+
+from metaloom.base import main  # noqa: E402
+from metaloom.base.backends import FakeLLM  # noqa: E402
+from metaloom.base.calls import LLMCaller  # noqa: E402
+from metaloom.base.main import RunnableChain  # noqa: E402
+
+
+def outline(topic: str):
+    return {"title": topic.upper()}
+
+
+def draft(subject: str):
+    return {"draft": subject}
+
+
+def review(draft: str):
+    return {"review": draft}
+
+
+def repeat(times: int):
+    return {"repeated": times}
+
+
+def chain_for(**options):
+    llm = FakeLLM()
+    chain = RunnableChain(llm, **options)
+    chain.add_function("outline", outline, "Outline {topic}")
+    chain.add_function("draft", draft, "Draft {subject}")
+    chain.add_function("review", review, "Review {draft}")
+    chain.add_function("repeat", repeat, "Repeat {times} times")
+    llm.register_chain(chain)
+    return chain, llm
+
+
+def outputs(bus):
+    return {record["name"]: record["output"] for step in bus for record in step.values()}
+
+
+def test_parallel_chain_batches_sibling_transforms():
+    chain, llm = chain_for()
+    chain.define_parallel_chain("both", ["draft", "review"])
+    assert outputs(chain.call_chain("both", topic="cats")) == {"draft": {"draft": "subject"}, "review": {"review": "draft"}}
+    # one batched transform for both functions, then one call each
+    assert llm.calls == 3
+
+
+def test_invalid_batch_slice_falls_back_to_its_own_transform(monkeypatch):
+    class Rejected:
+        @classmethod
+        def parse_obj(cls, data):
+            raise ValueError("invalid slice")
+
+    create = main.create
+    monkeypatch.setattr(main, "create", lambda name, function: Rejected if function is repeat else create(name, function))
+    chain, llm = chain_for()
+    chain.define_parallel_chain("both", ["draft", "repeat"])
+    assert outputs(chain.call_chain("both", topic="cats"))["draft"] == {"draft": "subject"}
+    # the batched transform, a transform of its own for `repeat`, then one call each
+    assert llm.calls == 4
+
+
+def test_stream_chain_yields_each_step_as_it_completes():
+    runs = []
+
+    def first(topic: str):
+        runs.append("first")
+        return {"topic": topic + "1"}
+
+    def second(topic: str):
+        runs.append("second")
+        return {"topic": topic + "2"}
+
+    llm = FakeLLM()
+    chain = RunnableChain(llm)
+    chain.add_function("first", first, "First {topic}")
+    chain.add_function("second", second, "Second {topic}")
+    llm.register_chain(chain)
+    chain.define_sequence_chain("steps", ["first", "second"])
+
+    steps = chain.stream_chain("steps", topic="t")
+    assert runs == []
+    record = next(steps)
+    # the second step has not run when the first record arrives
+    assert runs == ["first"]
+    assert list(record) == [0]
+    assert record[0]["output"] == {"topic": "t1"}
+    rest = list(steps)
+    assert [list(step_info) for step_info in rest] == [[1]]
+    assert rest[0][1]["output"] == {"topic": "t12"}
+    assert set(rest[0][1]["timings"]) == {"started", "finished", "elapsed"}
+
+
+def test_astream_chain_matches_stream_chain():
+    chain, _ = chain_for()
+    chain.define_sequence_chain("story", ["outline", "draft", "review"])
+
+    async def collect():
+        return [step_info async for step_info in chain.astream_chain("story", topic="cats")]
+
+    streamed = [step_info for step_info in chain.stream_chain("story", topic="cats")]
+    awaited = asyncio.run(collect())
+    assert [{i: record["output"] for i, record in s.items()} for s in awaited] == \
+        [{i: record["output"] for i, record in s.items()} for s in streamed]
+
+
+def test_stream_chain_raises_the_failing_step():
+    def broken(draft: str):
+        raise RuntimeError("review failed")
+
+    chain, llm = chain_for()
+    chain.add_function("broken", broken, "Break {draft}")
+    llm.register("Break {draft}", broken)
+    chain.define_sequence_chain("story", ["draft", "broken"])
+    steps = chain.stream_chain("story", subject="cats")
+    assert next(steps)[0]["output"] == {"draft": "cats"}
+    with pytest.raises(RuntimeError, match="review failed"):
+        next(steps)
+
+    async def drain():
+        return [step_info async for step_info in chain.astream_chain("story", subject="cats")]
+
+    with pytest.raises(RuntimeError, match="review failed"):
+        asyncio.run(drain())
+
+
+def test_step_records_split_time_and_count_tokens():
+    llm = FakeLLM(latency=0.05)
+    chain = RunnableChain(llm, caller=LLMCaller(token_counter=len))
+    chain.add_function("outline", outline, "Outline {topic}")
+    chain.add_function("draft", draft, "Draft {subject}")
+    llm.register_chain(chain)
+    chain.define_sequence_chain("story", ["outline", "draft"])
+    first, second = [record["metrics"] for step in chain.call_chain("story", topic="cats") for record in step.values()]
+
+    assert first["llm_calls"] == 1
+    assert first["prompt_tokens"] == len("Outline cats")
+    assert first["completion_tokens"] == len('{"topic": "cats"}')
+    assert first["llm"] >= 0.05 and first["transform"] < 0.05
+    assert first["parse"] > 0
+
+    # draft needs a transform from title to subject, timed apart from its own call
+    assert second["llm_calls"] == 2
+    assert second["transform"] >= 0.05 and second["llm"] >= 0.05
+    assert second["total"] >= second["transform"] + second["llm"]
+    assert second["prompt_tokens"] > len("Draft subject")
@@ -0,0 +1,101 @@
+import pytest
+
+from metaloom.base.checkpoint import CheckpointStore
+
+
+def test_steps_round_trip(tmp_path):
+    store = CheckpointStore(tmp_path / "runs.db")
+    run_id = store.start_run("story", {"topic": "cats"})
+    store.save_inputs(run_id, 0, "write", {"topic": "cats"})
+    assert store.get_steps(run_id) == {0: {"name": "write", "inputs": {"topic": "cats"}, "record": None}}
+    store.save_step(run_id, 0, "write", {"name": "write", "output": {"text": "meow"}})
+    assert store.get_steps(run_id)[0]["inputs"] == {"topic": "cats"}
+    assert store.get_steps(run_id)[0]["record"]["output"] == {"text": "meow"}
+
+
+def test_run_status_and_delete(tmp_path):
+    store = CheckpointStore(tmp_path / "runs.db")
+    run_id = store.start_run("story", {"topic": "cats"})
+    store.set_status(run_id, "failed")
+    assert store.get_run(run_id)["status"] == "failed"
+    assert store.get_run(run_id)["kwargs"] == {"topic": "cats"}
+    store.delete_run(run_id)
+    assert store.get_run(run_id) is None
+
+
+def flaky_chain(tmp_path):
+    pytest.importorskip("langchain_core")
+    from metaloom.base.backends import FakeLLM
+    from metaloom.base.main import RunnableChain
+
+    runs = []
+
+    def outline(topic: str):
+        runs.append("outline")
+        return {"title": topic.upper()}
+
+    def draft(subject: str):
+        runs.append("draft")
+        if runs.count("draft") == 1:
+            raise RuntimeError("draft failed")
+        return {"draft": subject}
+
+    def publish(draft: str):
+        runs.append("publish")
+        return {"url": draft.lower()}
+
+    llm = FakeLLM()
+    chain = RunnableChain(llm, checkpoints=CheckpointStore(tmp_path / "runs.db"))
+    chain.add_function("outline", outline, "Outline {topic}")
+    chain.add_function("draft", draft, "Draft {subject}")
+    chain.add_function("publish", publish, "Publish {draft}")
+    llm.register_chain(chain)
+    return chain, llm, runs
+
+
+@pytest.mark.parametrize("kind", ["sequence", "dag"])
+def test_resume_restarts_at_the_failed_step(tmp_path, kind):
+    chain, llm, runs = flaky_chain(tmp_path)
+    if kind == "sequence":
+        chain.define_sequence_chain("story", ["outline", "draft", "publish"])
+    else:
+        chain.define_dag_chain("story", ["outline", "draft", "publish"], [("outline", "draft"), ("draft", "publish")])
+    with pytest.raises(RuntimeError) as failure:
+        chain.call_chain("story", topic="cats")
+    run_id = failure.value.run_id
+    assert chain.checkpoints.get_run(run_id)["status"] == "failed"
+    # outline, the transform from title to subject, and draft
+    assert llm.calls == 3
+
+    bus = chain.resume_chain(run_id)
+    assert runs == ["outline", "draft", "draft", "publish"]
+    # draft reuses its saved inputs, so only draft and publish call the model again
+    assert llm.calls == 5
+    records = [record for step in bus for record in step.values()]
+    assert [record.get("resumed", False) for record in records] == [True, False, False]
+    assert records[-1]["output"] == {"url": "subject"}
+    assert chain.checkpoints.get_run(run_id)["status"] == "done"
+
+
+def test_fused_steps_checkpoint_adapted_inputs(tmp_path):
+    chain, llm, runs = flaky_chain(tmp_path)
+
+    def headline(title: str):
+        runs.append("headline")
+        if runs.count("headline") == 1:
+            raise RuntimeError("headline failed")
+        return {"headline": title}
+
+    chain.add_function("headline", headline, "Headline {title}")
+    llm.register("Headline {title}", headline)
+    chain.define_sequence_chain("story", ["outline", "headline"], fused=True)
+    with pytest.raises(RuntimeError) as failure:
+        chain.call_chain("story", topic="cats")
+    run_id = failure.value.run_id
+    assert chain.checkpoints.get_steps(run_id)[1]["inputs"] == {"title": "CATS"}
+
+    calls = llm.calls
+    bus = chain.resume_chain(run_id)
+    assert bus[-1][1]["output"] == {"headline": "CATS"}
+    assert "fused" not in bus[-1][1]
+    assert llm.calls == calls + 1
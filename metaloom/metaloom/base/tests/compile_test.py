@@ -0,0 +1,54 @@
+import pytest
+
+pytest.importorskip("langchain_core")
+
+from metaloom.base.backends import FakeLLM  # noqa: E402
+from metaloom.base.main import RunnableChain  # noqa: E402
+
+
+def outline(topic: str):
+    return {"title": topic.upper()}
+
+
+def draft(subject: str):
+    return {"draft": subject}
+
+
+def review(draft: str):
+    return {"review": draft}
+
+
+def chain_for(**options):
+    llm = FakeLLM()
+    chain = RunnableChain(llm, **options)
+    chain.add_function("outline", outline, "Outline {topic}")
+    chain.add_function("draft", draft, "Draft {subject}")
+    chain.add_function("review", review, "Review {draft}")
+    llm.register_chain(chain)
+    return chain, llm
+
+
+def test_sequence_matches_call_chain():
+    chain, llm = chain_for()
+    chain.define_sequence_chain("story", ["outline", "draft", "review"])
+    assert chain.compile("story").invoke({"topic": "cats"}) == {"review": "subject"}
+    # outline, the title -> subject transform, draft and review
+    assert llm.calls == 4
+
+
+def test_fused_sequence_answers_unmapped_steps_in_one_call():
+    chain, llm = chain_for()
+    chain.define_sequence_chain("story", ["outline", "draft", "review"], fused=True)
+    assert chain.compile("story").invoke({"topic": "cats"}) == {"review": "subject"}
+    assert llm.calls == 3
+    calls = llm.calls
+    chain.call_chain("story", topic="cats")
+    assert llm.calls - calls == 3
+
+
+@pytest.mark.parametrize("batch_transforms, calls", [(True, 3), (False, 4)])
+def test_parallel_siblings_share_a_batched_transform(batch_transforms, calls):
+    chain, llm = chain_for(batch_transforms=batch_transforms)
+    chain.define_parallel_chain("both", ["draft", "review"])
+    assert chain.compile("both").invoke({"topic": "cats"}) == {"draft": {"draft": "subject"}, "review": {"review": "draft"}}
+    assert llm.calls == calls
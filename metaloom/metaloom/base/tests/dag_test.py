@@ -0,0 +1,84 @@
+import time
+
+import pytest
+
+pytest.importorskip("langchain_core")
+
+from metaloom.base.backends import FakeLLM  # noqa: E402
+from metaloom.base.main import RunnableChain, topological_order  # noqa: E402
+
+
+def start(topic: str):
+    return {"topic": topic}
+
+
+def left(topic: str):
+    return {"left": topic + "L", "text": "left"}
+
+
+def right(topic: str):
+    return {"right": topic + "R", "text": "right"}
+
+
+def middle(topic: str):
+    return {"middle": topic + "M"}
+
+
+def join(left: str, right: str, text: str):
+    return {"joined": f"{left}{right}", "text": text}
+
+
+def graph(latency=0.0):
+    llm = FakeLLM(latency=latency)
+    chain = RunnableChain(llm)
+    chain.add_function("start", start, "Start {topic}")
+    chain.add_function("left", left, "Left {topic}")
+    chain.add_function("right", right, "Right {topic}")
+    chain.add_function("middle", middle, "Middle {topic}")
+    chain.add_function("join", join, "Join {left} {right} {text}")
+    llm.register_chain(chain)
+    return chain, llm
+
+
+def outputs(bus):
+    return {record["name"]: record["output"] for step in bus for record in step.values()}
+
+
+def test_rejects_cycles():
+    chain, _ = graph()
+    with pytest.raises(ValueError):
+        chain.define_dag_chain("g", ["start", "left", "right"], [("start", "left"), ("left", "right"), ("right", "left")])
+    with pytest.raises(ValueError):
+        topological_order(["a", "b"], [("a", "b"), ("b", "a")])
+
+
+def test_rejects_edges_to_unknown_nodes():
+    chain, _ = graph()
+    with pytest.raises(KeyError):
+        chain.define_dag_chain("g", ["start", "left"], [("start", "right")])
+    with pytest.raises(KeyError):
+        chain.define_dag_chain("g", ["start", "nowhere"], [("start", "nowhere")])
+    assert "g" not in chain.chains
+
+
+def test_fan_in_merges_in_edge_order():
+    chain, _ = graph()
+    chain.define_dag_chain("g", ["start", "left", "right", "join"],
+                           [("start", "left"), ("start", "right"), ("left", "join"), ("right", "join")])
+    assert outputs(chain.call_chain("g", topic="t"))["join"] == {"joined": "tLtR", "text": "right"}
+    chain.define_dag_chain("g", ["start", "left", "right", "join"],
+                           [("start", "left"), ("start", "right"), ("right", "join"), ("left", "join")])
+    assert outputs(chain.call_chain("g", topic="t"))["join"] == {"joined": "tLtR", "text": "left"}
+
+
+def test_independent_branches_run_concurrently():
+    chain, llm = graph(latency=0.2)
+    chain.define_dag_chain("g", ["start", "left", "middle", "right", "join"],
+                           [("start", "left"), ("start", "middle"), ("start", "right"), ("left", "join"), ("right", "join")])
+    started = time.perf_counter()
+    bus = chain.call_chain("g", topic="t")
+    elapsed = time.perf_counter() - started
+    assert llm.calls == 5
+    assert outputs(bus)["middle"] == {"middle": "tM"}
+    # Three levels of 0.2 s calls; running the five calls one by one takes 1 s.
+    assert elapsed < 0.9
@@ -0,0 +1,68 @@
+import inspect
+import json
+import math
+import time
+
+import pytest
+
+from metaloom.base import decoding
+from metaloom.base.decoding import decode, repair
+
+
+def test_repairs_fenced_single_quoted_output():
+    text = "Here you go:\n```json\n{'title': 'it\\'s', 'ok': True, 'tags': [1, 2,],}\n```"
+    assert json.loads(repair(text)) == {"title": "it's", "ok": True, "tags": [1, 2]}
+
+
+def test_coerces_to_signature():
+    def step(count: int, ratio: float, ok: bool, tags: list):
+        pass
+
+    text = '{"count": "3", "ratio": 1, "ok": "false", "tags": "[1, 2]", "extra": "1"}'
+    assert decode(text, inspect.signature(step)) == {"count": 3, "ratio": 1.0, "ok": False, "tags": [1, 2], "extra": "1"}
+
+
+def test_repair_keeps_non_ascii_words():
+    assert repair("{café: True}") == "{café: true}"
+    with pytest.raises(json.JSONDecodeError):
+        decode("{'a': straße}")
+
+
+def test_repair_is_linear_in_commas():
+    def elapsed(count):
+        text = "[" + ", ".join(["'x'"] * count) + ",]"
+        started = time.perf_counter()
+        assert json.loads(repair(text)) == ["x"] * count
+        return time.perf_counter() - started
+
+    # Four times the commas: about 4x the time in one pass, 16x if every comma copies the rest.
+    assert elapsed(80_000) < 8 * elapsed(20_000)
+
+
+def test_unrepairable_output_raises():
+    with pytest.raises(json.JSONDecodeError):
+        decode("no json here")
+
+
+class LossyOrjson:
+    """Stands in for orjson: rejects NaN and turns long integers into floats."""
+
+    class JSONDecodeError(ValueError):
+        pass
+
+    @classmethod
+    def loads(cls, text):
+        if "NaN" in text:
+            raise cls.JSONDecodeError("NaN is not JSON")
+        return json.loads(text, parse_int=float)
+
+
+def test_orjson_rejections_fall_back_to_json(monkeypatch):
+    monkeypatch.setattr(decoding, "orjson", LossyOrjson)
+    value = decode('{"x": NaN}')
+    assert math.isnan(value["x"])
+
+
+def test_long_integers_keep_their_precision(monkeypatch):
+    monkeypatch.setattr(decoding, "orjson", LossyOrjson)
+    assert decode('{"n": 123456789012345678901234567890}') == {"n": 123456789012345678901234567890}
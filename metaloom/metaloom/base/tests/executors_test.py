@@ -0,0 +1,64 @@
+import os
+import time
+
+import pytest
+
+from metaloom.base import executors
+from metaloom.base.executors import iter_map, ordered_map
+
+
+def slow_double(x):
+    time.sleep(0.01 * (5 - x))
+    return x * 2
+
+
+def fail_on_two(x):
+    if x == 2:
+        raise ValueError("two")
+    return x
+
+
+def tag_pid(x):
+    if x == 2:
+        raise ValueError("two")
+    return {"x": x, "pid": os.getpid()}
+
+
+def test_thread_map_keeps_order():
+    items = [{"x": x} for x in range(5)]
+    assert ordered_map(slow_double, items, executor="thread", max_workers=5) == [0, 2, 4, 6, 8]
+
+
+def test_capture_errors():
+    items = [{"x": x} for x in range(4)]
+    results = ordered_map(fail_on_two, items, executor="thread", capture_errors=True)
+    assert results[:2] == [0, 1] and results[3] == 3
+    assert isinstance(results[2], ValueError)
+    with pytest.raises(ValueError):
+        ordered_map(fail_on_two, items)
+
+
+def test_iter_map_is_lazy():
+    items = ({"x": x} for x in range(1000))
+    results = iter_map(slow_double, items, executor="thread", max_workers=2)
+    assert next(results) == 0
+    results.close()
+
+
+def test_process_runner_pickles_module_functions():
+    pytest.importorskip("langchain_core")
+    from metaloom.base.backends import FakeLLM
+    from metaloom.base.main import RunnableFunction
+
+    runner = RunnableFunction(FakeLLM(), tag_pid, "Tag {x}", executor="process", max_workers=2, capture_errors=True)
+    try:
+        single = runner.process_response({"text": {"x": 1}})
+        assert single["x"] == 1 and single["pid"] != os.getpid()
+        results = runner.process_response({"text": [{"x": x} for x in range(4)]})
+        assert [result["x"] for result in results if isinstance(result, dict)] == [0, 1, 3]
+        assert all(result["pid"] != os.getpid() for result in results if isinstance(result, dict))
+        assert isinstance(results[2], ValueError)
+        with pytest.raises(ValueError):
+            runner.process_response({"text": {"x": 2}})
+    finally:
+        executors.shutdown()
@@ -0,0 +1,101 @@
+import pytest
+
+pytest.importorskip("langchain_core")
+
+from metaloom.base import backends  # noqa: E402
+from metaloom.base.calls import LLMCaller  # noqa: E402
+from metaloom.base.multiprompt import MultiTemplate  # noqa: E402
+
+# Class-level registries, shared by every MultiTemplate.
+REGISTRIES = ("_my_prompts", "_my_compiled", "_my_selections", "_my_reqs")
+
+
+@pytest.fixture
+def multi(monkeypatch):
+    monkeypatch.setenv("METALOOM_BACKEND", "fake")
+    for registry in REGISTRIES:
+        monkeypatch.setattr(MultiTemplate, registry, {})
+    backends.clear_clients()
+    multi = MultiTemplate()
+    multi.add_template(
+        name="greet",
+        system="Be kind.",
+        template="Greet {who} in {lang}",
+        input_variables=["who", "lang"],
+        output_variables={},
+        rules=["Keep it short"],
+    )
+    yield multi
+    backends.clear_clients()
+
+
+def test_missing_variables_are_reported_per_item(multi):
+    results = multi.cue_many("greet", [{"who": "Ann", "lang": "fr"}, {"who": "Bo"}])
+    assert results[0]["error"] is None
+    assert isinstance(results[1]["error"], KeyError)
+    assert results[1]["output"] is None
+
+
+def test_rules_render_without_placeholders(multi):
+    messages = multi.render("greet", {"who": "Ann", "lang": "fr"})
+    assert all("{" not in message.content for message in messages)
+
+
+def test_set_caller_on_the_class(multi, monkeypatch):
+    steps = []
+
+    class Caller(LLMCaller):
+        def __call__(self, llm, prompt, step="", parse=None):
+            steps.append(step)
+            return super().__call__(llm, prompt, step, parse)
+
+    monkeypatch.setattr(MultiTemplate, "_my_caller", None)
+    MultiTemplate.set_caller(Caller())
+    multi.cue("greet", {"who": "Ann", "lang": "fr"})
+    assert steps == ["greet"]
+
+
+def test_renderer_is_reused_until_what_it_uses_changes(multi):
+    multi.add_selection("colors", {"red": "A warm color"})
+    multi.add_meta_request("info", {"mood": "How the answer feels"})
+    multi.add_template(name="paint", system="Paint.", template="Paint {thing}", input_variables=["thing"],
+                       output_variables={}, selections=["colors"])
+    multi.add_template(name="note", system="Note.", template="Note {thing}", input_variables=["thing"],
+                       output_variables={}, meta_requests=["info"])
+    greet, paint, note = multi.renderer("greet"), multi.renderer("paint"), multi.renderer("note")
+    assert multi.renderer("paint") is paint
+
+    multi.add_selection("colors", {"red": "A warm color", "teal": "A cool color"})
+    assert multi.renderer("paint") is not paint
+    assert "teal" in "".join(message.content for message in multi.renderer("paint").messages)
+    assert multi.renderer("greet") is greet
+    assert multi.renderer("note") is note
+
+    multi.add_meta_request("info", {"tone": "The tone of the answer"})
+    assert multi.renderer("note") is not note
+    assert multi.renderer("greet") is greet
+
+    multi.invalidate("greet")
+    assert multi.renderer("greet") is not greet
+
+
+def test_cue_and_build_on_a_fresh_template(monkeypatch):
+    monkeypatch.setenv("METALOOM_BACKEND", "fake")
+    for registry in REGISTRIES:
+        monkeypatch.setattr(MultiTemplate, registry, {})
+    backends.clear_clients()
+    multi = MultiTemplate()
+    multi.add_template(name="echo", system="Echo.", template="Echo {word}", input_variables=["word"], output_variables={})
+    assert multi.cue("echo", {"word": "hi"}) == {}
+    assert multi.buiild_prompt("echo").messages[-1].content == "Echo {word}"
+    assert multi._myformat({"word": "hi"}, name="echo").endswith("Echo hi")
+    backends.clear_clients()
+
+
+def test_templates_share_the_pooled_client(multi):
+    other = MultiTemplate()
+    multi.cue("greet", {"who": "Ann", "lang": "fr"})
+    other.cue("greet", {"who": "Bo", "lang": "de"})
+    assert len(backends._CLIENTS) == 1
+    client = next(iter(backends._CLIENTS.values()))
+    assert client.calls == 2
@@ -0,0 +1,80 @@
+import threading
+import time
+
+import pytest
+
+from metaloom.base.policy import CallPolicy
+
+
+def failing(times, error=ConnectionError):
+    calls = []
+
+    def fn():
+        calls.append(1)
+        if len(calls) <= times:
+            raise error("boom")
+        return "ok"
+
+    return fn, calls
+
+
+def test_retries_retryable_errors():
+    policy = CallPolicy(retries=3, backoff=0)
+    fn, calls = failing(2)
+    assert policy.run(fn) == "ok"
+    assert len(calls) == 3
+    assert policy.stats["retries"] == 2
+
+
+def test_gives_up_after_the_last_retry():
+    policy = CallPolicy(retries=1, backoff=0)
+    fn, calls = failing(5)
+    with pytest.raises(ConnectionError):
+        policy.run(fn)
+    assert len(calls) == 2
+
+
+def test_does_not_retry_other_errors():
+    policy = CallPolicy(retries=3, backoff=0)
+    fn, calls = failing(1, error=ValueError)
+    with pytest.raises(ValueError):
+        policy.run(fn)
+    assert len(calls) == 1
+    assert policy.stats["retries"] == 0
+
+
+def test_timeout_abandons_slow_attempts():
+    policy = CallPolicy(timeout=0.05)
+    release = threading.Event()
+    started = time.monotonic()
+    with pytest.raises(TimeoutError):
+        policy.run(lambda: release.wait(5))
+    release.set()
+    assert time.monotonic() - started < 1
+    assert policy.stats["timeouts"] == 1
+
+
+def test_hedge_wins_over_a_stuck_attempt():
+    policy = CallPolicy(hedge_after=0.02)
+    release = threading.Event()
+    calls = []
+
+    def fn():
+        calls.append(1)
+        if len(calls) == 1:
+            release.wait(5)
+            return "primary"
+        return "hedge"
+
+    assert policy.run(fn) == "hedge"
+    release.set()
+    assert policy.stats["hedges"] == 1
+    assert policy.stats["hedge_wins"] == 1
+
+
+def test_hedge_percentile_waits_for_samples():
+    policy = CallPolicy(hedge_percentile=50, min_samples=3)
+    assert policy.hedge_delay() is None
+    for _ in range(3):
+        policy.run(lambda: "ok")
+    assert policy.hedge_delay() is not None
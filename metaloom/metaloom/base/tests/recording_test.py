@@ -0,0 +1,64 @@
+import pytest
+
+from metaloom.base.calls import LLMCaller
+from metaloom.base.recording import Recorder, load_recording, prompt_key
+
+
+class EchoLLM:
+    model_name = "echo"
+
+    def invoke(self, prompt):
+        return prompt.upper()
+
+
+def test_caller_records_calls(tmp_path):
+    recorder = Recorder(tmp_path / "calls.jsonl")
+    caller = LLMCaller(recorder=recorder)
+    assert caller(EchoLLM(), "hi", step="greet") == "HI"
+    caller(EchoLLM(), "hi", step="greet")
+    entries = load_recording(tmp_path / "calls.jsonl")
+    assert recorder.count == 2
+    assert [entry["response"] for entry in entries[prompt_key("hi")]] == ["HI", "HI"]
+    assert entries[prompt_key("hi")][0]["step"] == "greet"
+    assert entries[prompt_key("hi")][0]["model"] == "echo"
+
+
+def outline(topic: str):
+    return {"outline": f"about {topic}"}
+
+
+def draft(outline: str):
+    return {"draft": outline.upper()}
+
+
+def article_chain(llm):
+    from metaloom.base.main import RunnableChain
+
+    chain = RunnableChain(llm, caller=LLMCaller())
+    chain.add_function("outline", outline, "Outline {topic}")
+    chain.add_function("draft", draft, "Draft from {outline}")
+    chain.define_sequence_chain("article", ["outline", "draft"])
+    return chain
+
+
+def outputs(bus):
+    return [record["output"] for step in bus for record in step.values()]
+
+
+def test_replay_reproduces_a_recorded_chain(tmp_path):
+    pytest.importorskip("langchain_core")
+    from metaloom.base.backends import FakeLLM, ReplayLLM
+
+    fake = FakeLLM()
+    recorded = article_chain(fake)
+    fake.register_chain(recorded)
+    recorded.caller.recorder = Recorder(tmp_path / "calls.jsonl")
+    expected = outputs(recorded.call_chain("article", topic="cats"))
+
+    replay = ReplayLLM(tmp_path / "calls.jsonl", scale=0)
+    assert outputs(article_chain(replay).call_chain("article", topic="cats")) == expected
+    assert replay.stats == {"hits": 2, "misses": 0}
+
+    with pytest.raises(KeyError):
+        article_chain(replay).call_chain("article", topic="dogs")
+    assert replay.stats["misses"] == 1
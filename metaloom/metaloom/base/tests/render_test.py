@@ -0,0 +1,27 @@
+import pytest
+
+from metaloom.base.render import CompiledTemplate, MessageRenderer
+
+
+class Message:
+    def __init__(self, content):
+        self.content = content
+
+
+def test_single_pass_with_missing_policies():
+    template = CompiledTemplate('Greet {who} in {lang}, as {"json": 1}')
+    assert template.variables == ["who", "lang"]
+    assert template.render({"who": "Ann", "lang": "fr"}) == 'Greet Ann in fr, as {"json": 1}'
+    assert template.render({"who": "Ann"}, missing="keep") == 'Greet Ann in {lang}, as {"json": 1}'
+    assert template.render({"who": "Ann"}, missing="empty") == 'Greet Ann in , as {"json": 1}'
+    assert template.render({}, missing=str.upper) == 'Greet WHO in LANG, as {"json": 1}'
+    with pytest.raises(KeyError):
+        template.render({"who": "Ann"})
+
+
+def test_messages_keep_their_type():
+    static = Message("Be brief.")
+    renderer = MessageRenderer([static, Message("Hi {who}")])
+    rendered = renderer.render({"who": "Bo"})
+    assert rendered[0] is static
+    assert isinstance(rendered[1], Message) and rendered[1].content == "Hi Bo"
@@ -0,0 +1,51 @@
+import pytest
+
+from metaloom.base.routing import ModelRouter
+
+
+class Model:
+    def __init__(self, model_name):
+        self.model_name = model_name
+
+
+def test_escalates_to_default_on_failure():
+    small, large = Model("small"), Model("large")
+    router = ModelRouter({"small": small}, {"transform": "small"})
+
+    def attempt(llm):
+        if llm is small:
+            raise ValueError("missing keys")
+        return "ok"
+
+    assert router.call("transform", "write", attempt, large) == "ok"
+    assert router.stats["transform:small"]["failures"] == 1
+    assert router.success_rate("transform:large") == 1.0
+
+
+def test_function_route_wins_over_phase_route():
+    router = ModelRouter({"a": Model("a"), "b": Model("b")}, {"invoke": "a", "invoke:write": "b"})
+    assert router.select("invoke", "write") == "b"
+    assert router.select("invoke", "edit") == "a"
+    with pytest.raises(ValueError):
+        router.add_route("parse", "a")
+
+
+def test_function_errors_do_not_escalate():
+    pytest.importorskip("langchain_core")
+    from metaloom.base.backends import FakeLLM
+    from metaloom.base.main import RunnableFunction
+
+    runs = []
+
+    def fail(x: str):
+        runs.append(x)
+        raise RuntimeError("function failed")
+
+    small, large = FakeLLM(model_name="small"), FakeLLM(model_name="large")
+    for llm in (small, large):
+        llm.register("X {x}", fail)
+    runner = RunnableFunction(large, fail, "X {x}", router=ModelRouter({"small": small}, {"invoke": "small"}))
+    with pytest.raises(RuntimeError):
+        runner.invoke({"x": "1"})
+    assert runs == ["1"]
+    assert (small.calls, large.calls) == (1, 0)
@@ -0,0 +1,56 @@
+import threading
+import time
+
+from metaloom.base.scheduler import BATCH, CallScheduler, TokenBucket, priority
+
+
+def test_token_bucket_wait_time():
+    bucket = TokenBucket(per_minute=60)
+    assert bucket.wait_time(60) == 0
+    bucket.take(60)
+    assert 0.9 < bucket.wait_time(1) <= 1.0
+
+
+def test_priority_context_sets_class():
+    scheduler = CallScheduler(requests_per_minute=1000)
+    with priority(BATCH):
+        assert scheduler.run(lambda: "ok", tokens=10) == "ok"
+    scheduler.run(lambda: "ok")
+    assert scheduler.stats["batch"]["calls"] == 1
+    assert scheduler.stats["interactive"]["calls"] == 1
+
+
+def test_empty_bucket_blocks_the_call():
+    scheduler = CallScheduler(requests_per_minute=1200)
+    scheduler.requests = TokenBucket(per_minute=1200, capacity=1)
+    scheduler.acquire()
+    # one request refills every 0.05 s
+    assert scheduler.acquire() >= 0.04
+    assert scheduler.stats["interactive"]["waited"] == 1
+
+
+def test_waiting_classes_share_capacity_by_weight():
+    scheduler = CallScheduler(requests_per_minute=3000, weights={"interactive": 3.0, "batch": 1.0})
+    bucket = scheduler.requests = TokenBucket(per_minute=3000, capacity=1)
+    bucket.level = -1000
+    order = []
+
+    def call(name):
+        scheduler.run(lambda: order.append(name), priority=name)
+
+    threads = [threading.Thread(target=call, args=(name,)) for name in ["interactive", "batch"] * 8]
+    for thread in threads:
+        thread.start()
+    deadline = time.monotonic() + 5
+    while sum(len(queue) for queue in scheduler._queues.values()) < 16 and time.monotonic() < deadline:
+        time.sleep(0.001)
+    assert sum(len(queue) for queue in scheduler._queues.values()) == 16
+    with scheduler._cond:
+        bucket.level, bucket.updated = 0, time.monotonic()
+        scheduler._cond.notify_all()
+    for thread in threads:
+        thread.join(5)
+
+    # dispatches are 0.02 s apart; while both classes wait, interactive gets 3 of every 4
+    assert order[:8].count("interactive") == 6
+    assert sorted(order) == sorted(["interactive", "batch"] * 8)
@@ -0,0 +1,29 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from metaloom.base.singleflight import SingleFlight
+
+
+def test_concurrent_calls_share_one_result():
+    flight = SingleFlight()
+    release = threading.Event()
+    calls = []
+
+    def slow():
+        calls.append(1)
+        release.wait(1)
+        return "done"
+
+    with ThreadPoolExecutor(4) as pool:
+        futures = [pool.submit(flight.do, "key", slow) for _ in range(4)]
+        deadline = time.monotonic() + 5
+        while flight.stats["coalesced"] < 3 and time.monotonic() < deadline:
+            time.sleep(0.001)
+        assert flight.stats["coalesced"] == 3
+        release.set()
+        results = [future.result() for future in futures]
+    assert len(calls) == 1
+    assert sorted(shared for _, shared in results) == [False, True, True, True]
+    assert flight.stats == {"leaders": 1, "coalesced": 3}
+    assert flight.in_flight() == 0
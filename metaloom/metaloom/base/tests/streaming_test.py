@@ -0,0 +1,83 @@
+import pytest
+
+from metaloom.base.streaming import IncrementalJSONParser
+
+
+def feed_by_char(text):
+    parser = IncrementalJSONParser()
+    completed = [pair for char in text for pair in parser.feed(char)]
+    return parser, completed
+
+
+def test_emits_fields_as_they_complete():
+    parser = IncrementalJSONParser()
+    assert parser.feed('```json\n{"title": "Ca') == []
+    assert parser.partial() == ("title", "Ca")
+    assert parser.feed('ts", "tags": ["a", "b"], "n": 3}') == [("title", "Cats"), ("tags", ["a", "b"]), ("n", 3)]
+    assert parser.done
+
+
+def test_repairs_single_quotes_and_python_literals():
+    parser, completed = feed_by_char("{'a': 'x, y', 'b': True, 'c': [1, 2,], 'd': None}")
+    assert completed == [("a", "x, y"), ("b", True), ("c", [1, 2]), ("d", None)]
+    assert parser.done
+
+
+def test_skips_values_that_cannot_be_repaired():
+    parser, completed = feed_by_char('{"a": nope, "b": 1}')
+    assert completed == [("b", 1)]
+    assert parser.fields == {"b": 1}
+
+
+def test_top_level_array_emits_nothing():
+    parser, completed = feed_by_char('[{"a": 1}, {"a": 2}]')
+    assert completed == []
+    assert parser.done
+    assert parser.fields == {}
+
+
+def write(title: str, body: str):
+    return {"title": title, "words": len(body.split())}
+
+
+@pytest.fixture
+def runner():
+    pytest.importorskip("langchain_core")
+    from metaloom.base.backends import FakeLLM
+    from metaloom.base.main import RunnableFunction
+
+    llm = FakeLLM(chunk_size=4)
+    llm.register("Write {title}: {body}", write)
+    return RunnableFunction(llm, write, "Write {title}: {body}")
+
+
+def test_on_ready_fires_once_its_fields_are_complete(runner):
+    events = []
+    for event in runner.stream({"title": "Cats", "body": "a b c"}, needs=["title"], on_ready=lambda f: events.append(("ready", f))):
+        events.append(("field", event["field"]) if "field" in event else ("output", event["output"]))
+    assert events == [
+        ("ready", {"title": "Cats"}),
+        ("field", "title"),
+        ("field", "body"),
+        ("output", {"title": "Cats", "words": 3}),
+    ]
+
+
+def test_on_ready_without_needs_waits_for_the_whole_object(runner):
+    ready = []
+    list(runner.stream({"title": "Cats", "body": "a b c"}, on_ready=ready.append))
+    assert ready == [{"title": "Cats", "body": "a b c"}]
+
+
+def test_stream_decodes_the_response_once(runner, monkeypatch, tmp_path):
+    from metaloom.base.cache import ResponseCache
+
+    decoded = []
+    decode = runner.decode_response
+    monkeypatch.setattr(runner, "decode_response", lambda text: decoded.append(text) or decode(text))
+    runner.caller.cache = ResponseCache(tmp_path / "responses.db")
+    for _ in range(2):
+        events = list(runner.stream({"title": "Cats", "body": "a b c"}))
+        assert events[-1] == {"output": {"title": "Cats", "words": 3}}
+    # once for the streamed answer, once for the cached one
+    assert len(decoded) == 2